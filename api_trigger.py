@@ -1,29 +1,375 @@
-from fastapi import FastAPI
+from fastapi import Body, FastAPI, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+import os
 import subprocess
 import sys
+import threading
+import time
+import uuid
 
-app = FastAPI(title="DemoAPI Test Trigger", version="1.0")
+from lib.warmrunner import SpawnCancelled, WarmRunner
 
+app = FastAPI(title="DemoAPI Test Trigger", version="2.0")
 
-@app.post("/run-tests")
-def run_tests():
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ====== 配置（环境变量）======
+MAX_CONCURRENT = int(os.getenv("TRIGGER_MAX_CONCURRENT", "1"))   # 同时运行的 job 数
+QUEUE_DEPTH = int(os.getenv("TRIGGER_QUEUE_DEPTH", "10"))         # 排队上限，超过返回 429
+JOB_DIR = os.getenv("TRIGGER_JOB_DIR", os.path.join(BASE_DIR, "report", "jobs"))
+MAX_FINISHED_JOBS = int(os.getenv("TRIGGER_MAX_FINISHED_JOBS", "100"))
+CANCEL_GRACE_SECONDS = 10
+# 预热模式：常驻 zygote 进程已 import 框架并加载 case sheet，每个 job 从它 fork（省掉解释器启动）
+WARM_POOL = os.getenv("TRIGGER_WARM_POOL", "0").strip().lower() in ("1", "true", "yes", "on") and hasattr(os, "fork")
+
+# /run-tests 里 --workers / --processes 的上限（超过返回 400），避免一次请求在 trigger 机器上起成千上万个线程 / 进程
+MAX_WORKERS = int(os.getenv("TRIGGER_MAX_WORKERS", "32"))
+MAX_PROCESSES = int(os.getenv("TRIGGER_MAX_PROCESSES", str(os.cpu_count() or 1)))
+ARG_LIMITS = {"--workers": MAX_WORKERS, "--processes": MAX_PROCESSES}
+
+# /run-tests 允许透传给 run_demo.py 的参数：flag -> 取值类型（None = 不带值）
+# 带路径的参数（--state-file / --report-dir / --record-cassette / --test-path ...）一律不接受：
+# job 的报告目录 / Excel 结果文件由 _env() 放在 job 目录下
+ALLOWED_ARGS = {
+    "--workers": int,
+    "--processes": int,
+    "--smoke-ids": str,
+    "--rerun-failed": None,
+    "--changed-only": None,
+    "--stream-report": None,
+    "--ndjson": None,
+    "--junit-xml": None,
+}
+
+QUEUED, RUNNING, SUCCESS, FAILED, CANCELLED = "QUEUED", "RUNNING", "SUCCESS", "FAILED", "CANCELLED"
+FINISHED = (SUCCESS, FAILED, CANCELLED)
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def validate_args(args):
+    """只放行 ALLOWED_ARGS 里的参数，其余返回 400"""
+    args, out = [str(a) for a in (args or [])], []
+    i = 0
+    while i < len(args):
+        flag, sep, value = args[i].partition("=")
+        if flag not in ALLOWED_ARGS:
+            raise HTTPException(status_code=400, detail=f"argument not allowed: {args[i]!r} "
+                                                        f"(allowed: {', '.join(sorted(ALLOWED_ARGS))})")
+        kind = ALLOWED_ARGS[flag]
+        if kind is None:
+            if sep:
+                raise HTTPException(status_code=400, detail=f"{flag} does not take a value")
+            out.append(flag)
+            i += 1
+            continue
+        if not sep:
+            if i + 1 >= len(args):
+                raise HTTPException(status_code=400, detail=f"{flag} requires a value")
+            value = args[i + 1]
+            i += 1
+        if kind is int and not (value.isdigit() and int(value) > 0):
+            raise HTTPException(status_code=400, detail=f"{flag} requires a positive integer, got {value!r}")
+        if flag in ARG_LIMITS and int(value) > ARG_LIMITS[flag]:
+            raise HTTPException(status_code=400, detail=f"{flag} must be at most {ARG_LIMITS[flag]}, got {value}")
+        if value.startswith("-"):
+            raise HTTPException(status_code=400, detail=f"invalid value for {flag}: {value!r}")
+        out += [flag, value]
+        i += 1
+    return out
+
+
+class Job:
+    """一次 run_demo.py 运行；日志直接写到磁盘（job 目录下的 run.log）"""
+
+    def __init__(self, args):
+        self.id = uuid.uuid4().hex
+        self.args = list(args)
+        self.status = QUEUED
+        self.exit_code = None
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.dir = os.path.join(JOB_DIR, self.id)
+        self.log_path = os.path.join(self.dir, "run.log")
+        self.summary = {}
+        self.runner = None
+        self.dispatch_ms = None
+        self.future = None
+        self.process = None
+        self.cancel_requested = False
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "exit_code": self.exit_code,
+            "args": self.args,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "runner": self.runner,
+            "dispatch_ms": self.dispatch_ms,
+            "log_path": self.log_path,
+            "report_path": self.summary.get("REPORT_PATH"),
+            "summary": self.summary,
+        }
+
+
+class JobManager:
+    """有界执行器：最多 MAX_CONCURRENT 个 job 同时运行，最多 QUEUE_DEPTH 个排队"""
+
+    def __init__(self, max_concurrent, queue_depth, warm=False):
+        self.queue_depth = queue_depth
+        self.warm = WarmRunner(BASE_DIR).start() if warm else None
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="job")
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, args):
+        with self.lock:
+            queued = sum(1 for j in self.jobs.values() if j.status == QUEUED)
+            if queued >= self.queue_depth:
+                raise HTTPException(status_code=429, detail=f"job queue is full ({queued} queued)")
+            job = Job(args)
+            self.jobs[job.id] = job
+            self._prune()
+        os.makedirs(job.dir, exist_ok=True)
+        job.future = self.executor.submit(self._run, job)
+        return job
+
+    def _prune(self):
+        finished = [k for k, j in self.jobs.items() if j.status in FINISHED]
+        for k in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[k]
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="job not found")
+        return job
+
+    def _env(self, job):
+        env = dict(os.environ)
+        # 每个 job 独立的报告目录 / Excel 结果文件 / 目标 API 数据命名空间，并发 job 互不覆盖
+        env["REPORT_DIR"] = os.path.join(job.dir, "report")
+        env["TARGET_FILE"] = os.path.join(job.dir, "report", "excelReport", "DemoAPITestCase.xlsx")
+        env["NAMESPACE"] = "1"
+        env.pop("RUN_ID", None)
+        env["PYTHONUNBUFFERED"] = "1"
+        return env
+
+    def _run(self, job):
+        with self.lock:
+            if job.cancel_requested:
+                return
+            job.status = RUNNING
+            job.started_at = _now()
+
+        try:
+            process = self._spawn(job)
+            if process is not None:
+                # cancel() 可能落在“已 RUNNING、进程还没起来”的窗口里（warm runner 预热时可能等很久），
+                # 那时它找不到进程；进程起来后在这里补上
+                with self.lock:
+                    cancelled = job.cancel_requested
+                if cancelled:
+                    self._stop(process)
+                job.exit_code = process.wait()
+        except Exception as e:
+            with open(job.log_path, "a", encoding="utf-8") as log:
+                log.write(f"\n[ERROR] failed to start job: {e}\n")
+            job.exit_code = -1
+
+        job.summary = self._read_summary(job.log_path)
+        with self.lock:
+            if job.cancel_requested:
+                job.status = CANCELLED
+            else:
+                job.status = SUCCESS if job.exit_code == 0 else FAILED
+            job.finished_at = _now()
+            job.process = None
+
+    def _spawn(self, job):
+        """启动 job 进程：优先从 warm runner fork，不可用时回退到新的解释器；启动前已取消则返回 None"""
+        env = self._env(job)
+        t0 = time.perf_counter()
+        process = None
+        if self.warm is not None:
+            # 请求写进 zygote 之后 spawn 只会等到 fork 完成或被取消，不会再抛 RuntimeError 让这里回退（否则 job 会跑两份）
+            try:
+                process = self.warm.spawn(job.id, job.args, env, job.log_path,
+                                          cancelled=lambda: job.cancel_requested)
+                job.runner = "warm"
+            except SpawnCancelled:
+                return None
+            except RuntimeError as e:
+                with open(job.log_path, "a", encoding="utf-8") as log:
+                    log.write(f"[WARN] {e}; falling back to a new interpreter\n")
+        if process is None:
+            with self.lock:
+                if job.cancel_requested:
+                    return None
+            with open(job.log_path, "ab") as log:
+                process = subprocess.Popen(
+                    [sys.executable, "run_demo.py"] + job.args,
+                    cwd=BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+                )
+            job.runner = "subprocess"
+        with self.lock:
+            job.process = process
+        job.dispatch_ms = round((time.perf_counter() - t0) * 1000, 1)
+        return process
+
+    @staticmethod
+    def _read_summary(log_path):
+        """run_demo.py 在结尾打印 KEY=VALUE 形式的汇总"""
+        summary = {}
+        try:
+            with open(log_path, encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    key, sep, value = line.strip().partition("=")
+                    if sep and key.isupper() and key.replace("_", "").isalnum():
+                        summary[key] = value
+        except OSError:
+            pass
+        return summary
+
+    def cancel(self, job):
+        with self.lock:
+            if job.status in FINISHED:
+                return False
+            job.cancel_requested = True
+            if job.status == QUEUED:
+                job.future.cancel()
+                job.status = CANCELLED
+                job.finished_at = _now()
+                return True
+            # 进程还没起来时由 _run 在 spawn 之后处理
+            process = job.process
+        if process is not None:
+            self._stop(process)
+        return True
+
+    @staticmethod
+    def _stop(process):
+        process.terminate()
+        try:
+            process.wait(timeout=CANCEL_GRACE_SECONDS)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+jobs = JobManager(MAX_CONCURRENT, QUEUE_DEPTH, warm=WARM_POOL)
+
+
+@app.post("/run-tests", status_code=202)
+def run_tests(args: Optional[List[str]] = Body(default=None)):
     """
-    Synchronous trigger:
-    - runs: python run_demo.py
-    - returns: status + exit_code + stdout/stderr tail
+    Asynchronous trigger:
+    - queues: python run_demo.py [args...]   (optional JSON body, e.g. ["--workers", "4"])
+    - only the flags in ALLOWED_ARGS are accepted (400 otherwise); paths are always per job
+    - returns immediately with a job id; poll /jobs/{job_id}, stream /jobs/{job_id}/log
     """
-    cmd = [sys.executable, "run_demo.py"]
-    p = subprocess.run(cmd, capture_output=True, text=True, check=False)
+    job = jobs.submit(validate_args(args))
+    data = job.to_dict()
+    data["links"] = {
+        "status": f"/jobs/{job.id}",
+        "log": f"/jobs/{job.id}/log",
+        "stream": f"/jobs/{job.id}/log/stream",
+        "cancel": f"/jobs/{job.id}/cancel",
+        "report": f"/jobs/{job.id}/report",
+    }
+    return data
+
+
+@app.get("/runner")
+def runner_status():
+    """job 启动方式；warm 模式下附带 zygote 状态（是否预热完成、预热耗时）"""
+    if jobs.warm is None:
+        return {"mode": "subprocess"}
+    return {"mode": "warm", **jobs.warm.status()}
+
+
+@app.get("/jobs")
+def list_jobs():
+    return [j.to_dict() for j in reversed(list(jobs.jobs.values()))]
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    return jobs.get(job_id).to_dict()
+
+
+@app.get("/jobs/{job_id}/log")
+def job_log(job_id: str, offset: int = Query(default=0, ge=0), limit: int = Query(default=65536, gt=0)):
+    """增量读取日志：传上次返回的 next_offset 继续读"""
+    job = jobs.get(job_id)
+    text = b""
+    if os.path.exists(job.log_path):
+        with open(job.log_path, "rb") as f:
+            f.seek(offset)
+            text = f.read(limit)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "offset": offset,
+        "next_offset": offset + len(text),
+        "text": text.decode("utf-8", errors="replace"),
+        "done": job.status in FINISHED,
+    }
+
+
+@app.get("/jobs/{job_id}/log/stream")
+def job_log_stream(job_id: str, offset: int = Query(default=0, ge=0)):
+    """持续输出日志直到 job 结束（text/plain 分块）"""
+    job = jobs.get(job_id)
+
+    def follow():
+        pos = offset
+        while True:
+            done = job.status in FINISHED
+            if os.path.exists(job.log_path):
+                with open(job.log_path, "rb") as f:
+                    f.seek(pos)
+                    chunk = f.read()
+                if chunk:
+                    pos += len(chunk)
+                    yield chunk
+            if done:
+                return
+            time.sleep(0.5)
+
+    return StreamingResponse(follow(), media_type="text/plain; charset=utf-8")
+
 
-    exit_code = p.returncode
-    status = "SUCCESS" if exit_code == 0 else "FAILED"
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    job = jobs.get(job_id)
+    if not jobs.cancel(job):
+        raise HTTPException(status_code=409, detail=f"job already {job.status}")
+    return job.to_dict()
 
-    out_lines = (p.stdout or "").splitlines()[-80:]
-    err_lines = (p.stderr or "").splitlines()[-80:]
 
+@app.get("/jobs/{job_id}/report")
+def job_report(job_id: str, download: bool = False):
+    job = jobs.get(job_id)
+    report_path = job.summary.get("REPORT_PATH")
+    if job.status not in FINISHED:
+        raise HTTPException(status_code=409, detail=f"job is {job.status}")
+    if not report_path or not os.path.exists(report_path):
+        raise HTTPException(status_code=404, detail="report not found")
+    if download:
+        return FileResponse(report_path, media_type="text/html")
     return {
-        "status": status,
-        "exit_code": exit_code,
-        "stdout_tail": out_lines,
-        "stderr_tail": err_lines,
+        "job_id": job.id,
+        "report_path": report_path,
+        "latest_report_path": job.summary.get("LATEST_REPORT_PATH"),
+        "metrics_path": job.summary.get("METRICS_PATH"),
     }
@@ -1,9 +1,22 @@
-from fastapi import FastAPI, Query, Form
+from fastapi import FastAPI, Query, Form, Header, Depends, HTTPException
 from fastapi.responses import JSONResponse
+from lib import jsoncodec
 from datetime import datetime
-import copy  # ✅ NEW
+from collections import OrderedDict
+import itertools
+import os
+import threading
+import time
+import uuid
 
-app = FastAPI()
+class CodecJSONResponse(JSONResponse):
+    """用 lib/jsoncodec 序列化（装了 orjson 时走 orjson）"""
+
+    def render(self, content) -> bytes:
+        return jsoncodec.dumps(content)
+
+
+app = FastAPI(default_response_class=CodecJSONResponse)
 
 def resp(status: int, message: str, data=None):
     """
@@ -18,10 +31,10 @@ def resp(status: int, message: str, data=None):
     }
     if data is not None:
         payload["data"] = data
-    return JSONResponse(status_code=200, content=payload)
+    return CodecJSONResponse(status_code=200, content=payload)
 
-# ====== 内存数据（为触发用例 07/08 设计）======
-EVENTS = [
+# ====== 初始数据（为触发用例 07/08 设计）：只用来构建下面的基线 BASELINE（Store 逐条复制）======
+SEED_EVENTS = [
     # 用例 01/02 必须能查到
     {"eid": 1, "name": "红米", "limit": 100, "address": "北京", "start_time": "2024-01-01 10:00:00"},
     # 用例 07：eid=3 已存在 -> 10022 + "event id already exists"
@@ -30,28 +43,157 @@ EVENTS = [
     {"eid": 11, "name": "红米Pro发布会", "limit": 2000, "address": "北京会展中心", "start_time": "2018-12-10 12:00:00"},
 ]
 
-GUESTS = [
+SEED_GUESTS = [
     # 用例 11/12：eid=1 必须能查到（phone 为空字符串也应 success）
     {"eid": 1, "realname": "张三", "phone": "13355557777", "email": "a@b.com"},
 ]
 
-# ✅ NEW: 固定初始快照（用于 reset）
-EVENTS_INIT = copy.deepcopy(EVENTS)
-GUESTS_INIT = copy.deepcopy(GUESTS)
+
+class Store:
+    """
+    内存数据 + 哈希索引（插入时维护）
+    - event: eid / name
+    - guest: eid / (eid, phone)
+    key 统一用 str()，和原来 str(x) == str(y) 的比较语义一致；
+    value 是按插入顺序的列表，查询结果顺序与线性扫描相同。
+
+    copy-on-write：base 是只读的基线快照，新数据只写进本层，
+    查询时 base 结果在前、本层在后，所以 reset = 换一个空的新层（O(1)）。
+    """
+
+    def __init__(self, events=(), guests=(), base=None, version=0):
+        self.base = base
+        self.version = version
+        self._event_by_eid = {}
+        self._event_by_name = {}
+        self._guest_by_eid = {}
+        self._guest_by_eid_phone = {}
+        self.lock = threading.Lock()
+        # 命名空间最近一次被访问的时间（淘汰空闲命名空间用）
+        self.last_used = 0.0
+        for e in events:
+            self.add_event(dict(e))
+        for g in guests:
+            self.add_guest(dict(g))
+
+    def add_event(self, event):
+        self._event_by_eid.setdefault(str(event["eid"]), []).append(event)
+        self._event_by_name.setdefault(event["name"], []).append(event)
+
+    def add_guest(self, guest):
+        self._guest_by_eid.setdefault(str(guest["eid"]), []).append(guest)
+        self._guest_by_eid_phone.setdefault((str(guest["eid"]), str(guest["phone"])), []).append(guest)
+
+    def _lookup(self, index_name, key):
+        own = getattr(self, index_name).get(key, ())
+        if self.base is None:
+            return list(own)
+        return self.base._lookup(index_name, key) + list(own)
+
+    def events_by_eid(self, eid):
+        return self._lookup("_event_by_eid", str(eid))
+
+    def events_by_name(self, name):
+        return self._lookup("_event_by_name", name)
+
+    def guests_by_eid(self, eid, phone=None):
+        if phone is None:
+            return self._lookup("_guest_by_eid", str(eid))
+        return self._lookup("_guest_by_eid_phone", (str(eid), str(phone)))
+
+
+# 基线快照只构建一次，之后只读
+BASELINE = Store(SEED_EVENTS, SEED_GUESTS)
+
+# ====== 命名空间：每个 run ID 一份独立数据（并行 CI / 分片互不干扰）======
+RUN_ID_HEADER = "X-Run-Id"
+DEFAULT_NAMESPACE = "default"
+MAX_NAMESPACES = 256
+# 超过上限时只淘汰空闲这么久的命名空间；还在用的一个都不动（新建返回 503）
+NAMESPACE_IDLE_SECONDS = float(os.getenv("NAMESPACE_IDLE_SECONDS", "600"))
+# 记住最近被淘汰的 run ID：再用到时返回 410，而不是悄悄从基线重建
+MAX_EVICTED = 4096
+
+_versions = itertools.count(1)
+_namespaces = OrderedDict()
+_evicted = OrderedDict()
+_namespaces_lock = threading.Lock()
+
+
+def _fresh_store():
+    return Store(base=BASELINE, version=next(_versions))
+
+
+def _set_namespace(ns, store):
+    """调用方持有 _namespaces_lock"""
+    if ns not in _namespaces and len(_namespaces) >= MAX_NAMESPACES:
+        # 淘汰最久没用、且空闲超过 NAMESPACE_IDLE_SECONDS 的（default 不淘汰）
+        now = time.monotonic()
+        oldest = next((k for k, v in _namespaces.items() if k != DEFAULT_NAMESPACE), None)
+        if oldest is None or now - _namespaces[oldest].last_used < NAMESPACE_IDLE_SECONDS:
+            raise HTTPException(status_code=503, detail=f"too many active namespaces ({len(_namespaces)}); "
+                                                        f"delete finished ones or retry later")
+        del _namespaces[oldest]
+        _evicted[oldest] = now
+        while len(_evicted) > MAX_EVICTED:
+            _evicted.popitem(last=False)
+    _evicted.pop(ns, None)
+    store.last_used = time.monotonic()
+    _namespaces[ns] = store
+    _namespaces.move_to_end(ns)
+
+
+def get_store(run_id: str = Header(default=None, alias=RUN_ID_HEADER)):
+    """按请求头 X-Run-Id 取对应命名空间；第一次出现的 run ID 自动从基线创建，已被淘汰的返回 410"""
+    ns = run_id or DEFAULT_NAMESPACE
+    with _namespaces_lock:
+        store = _namespaces.get(ns)
+        if store is None:
+            if ns in _evicted:
+                raise HTTPException(status_code=410, detail=f"namespace {ns} was evicted after being idle; "
+                                                            f"reset it or allocate a new one")
+            store = _fresh_store()
+            _set_namespace(ns, store)
+        else:
+            store.last_used = time.monotonic()
+            _namespaces.move_to_end(ns)
+        return store
+
 
 # ✅ NEW: reset endpoint（CI/重复运行稳定）
 @app.post("/api/test/reset")
-def test_reset():
-    global EVENTS, GUESTS
-    EVENTS = copy.deepcopy(EVENTS_INIT)
-    GUESTS = copy.deepcopy(GUESTS_INIT)
-    return resp(200, "reset success")
+def test_reset(run_id: str = Header(default=None, alias=RUN_ID_HEADER)):
+    ns = run_id or DEFAULT_NAMESPACE
+    store = _fresh_store()
+    with _namespaces_lock:
+        _set_namespace(ns, store)
+    return resp(200, "reset success", {"run_id": ns, "version": store.version})
+
+
+@app.post("/api/test/namespace")
+def create_namespace():
+    """分配一个新的 run ID（数据为基线的独立副本），后续请求带 X-Run-Id 头即可"""
+    ns = uuid.uuid4().hex
+    store = _fresh_store()
+    with _namespaces_lock:
+        _set_namespace(ns, store)
+    return resp(200, "namespace created", {"run_id": ns, "version": store.version})
+
+
+@app.delete("/api/test/namespace/{run_id}")
+def delete_namespace(run_id: str):
+    with _namespaces_lock:
+        removed = _namespaces.pop(run_id, None)
+    if removed is None:
+        return resp(10022, "namespace not found")
+    return resp(200, "namespace deleted")
 
 # ====== 1) get_event_list ======
 @app.get("/api/get_event_list/")
 def get_event_list(
     eid: str = Query(default=None),
     name: str = Query(default=None),
+    store: Store = Depends(get_store),
 ):
     # 用例 03：eid 和 name 都空
     if (eid is None or eid == "") and (name is None or name == ""):
@@ -59,10 +201,10 @@ def get_event_list(
 
     # 按 eid 查
     if eid not in (None, ""):
-        result = [e for e in EVENTS if str(e["eid"]) == str(eid)]
+        result = store.events_by_eid(eid)
     # 按 name 查
     elif name not in (None, ""):
-        result = [e for e in EVENTS if e["name"] == name]
+        result = store.events_by_name(name)
     else:
         result = []
 
@@ -81,40 +223,44 @@ def add_event(
     limit: str = Form(...),
     address: str = Form(...),
     start_time: str = Form(...),
+    store: Store = Depends(get_store),
 ):
     # 用例 06：空参数
     if not all([eid, name, limit, address, start_time]):
         return resp(10021, "parameter error")
 
-    # 用例 07：eid 已存在 -> 10022
-    if any(str(e["eid"]) == str(eid) for e in EVENTS):
-        return resp(10022, "event id already exists")
-
-    # 用例 08：name 已存在 -> 10023
-    if any(e["name"] == name for e in EVENTS):
-        return resp(10023, "event name already exists")
-
-    # 用例 09：时间格式错误 -> 10024 + 固定文案
-    try:
-        datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
-    except Exception:
-        return resp(10024, "start_time format error. It must be in YYYY-MM-DD HH:MM:SS format.")
-
-    # 用例 10：成功 -> 200 + add event success
-    EVENTS.append({
-        "eid": int(eid),
-        "name": name,
-        "limit": limit,
-        "address": address,
-        "start_time": start_time,
-    })
-    return resp(200, "add event success")
+    # 同一命名空间内“查重 + 插入”要原子，避免并发请求插入重复 eid/name
+    with store.lock:
+        # 用例 07：eid 已存在 -> 10022
+        if store.events_by_eid(eid):
+            return resp(10022, "event id already exists")
+
+        # 用例 08：name 已存在 -> 10023
+        if store.events_by_name(name):
+            return resp(10023, "event name already exists")
+
+        # 用例 09：时间格式错误 -> 10024 + 固定文案
+        try:
+            datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+        except Exception:
+            return resp(10024, "start_time format error. It must be in YYYY-MM-DD HH:MM:SS format.")
+
+        # 用例 10：成功 -> 200 + add event success
+        store.add_event({
+            "eid": int(eid),
+            "name": name,
+            "limit": limit,
+            "address": address,
+            "start_time": start_time,
+        })
+    return resp(200, "add event success", {"eid": int(eid), "name": name})
 
 # ====== 3) get_guest_list ======
 @app.get("/api/get_guest_list/")
 def get_guest_list(
     eid: str = Query(default=None),
     phone: str = Query(default=None),
+    store: Store = Depends(get_store),
 ):
     # 用例 13：eid 为空（不管 phone） -> 10021 + "eid cannot be empty"
     if eid is None or eid == "":
@@ -123,9 +269,7 @@ def get_guest_list(
     # 用例 12：phone="" 当作没传
     phone_eff = None if phone in (None, "") else str(phone)
 
-    result = [g for g in GUESTS if str(g["eid"]) == str(eid)]
-    if phone_eff is not None:
-        result = [g for g in result if str(g["phone"]) == phone_eff]
+    result = store.guests_by_eid(eid, phone_eff)
 
     # 用例 14/15：查不到
     if not result:
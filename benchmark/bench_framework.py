@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# _*_ coding:utf-8 _*_
+__author__ = "Qun Li"
+
+"""
+Framework overhead benchmarks (harness hot paths, not the API).
+
+    python benchmark/bench_framework.py --sizes 1000,10000,100000 --repeat 3
+    python benchmark/bench_framework.py --baseline report/benchmark/old.json --tolerance 0.25
+
+Results are written as JSON (schema below) so two versions of the harness can be compared:
+    {"schema": 1, "environment": {...}, "results": [{"bench", "cases", "seconds", "per_case_us", ...}]}
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import contextlib
+import unittest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from openpyxl import Workbook
+
+from config import setting
+from lib.readexcel import ReadExcel
+from lib.sendrequests import safe_parse
+from lib.writeexcel import WriteExcel, ResultCollector, set_result_sink
+from package import HTMLTestRunner as htr
+
+SCHEMA_VERSION = 1
+
+HEADER = ("module", "ID", "UseCase", "url", "method", "params", "headers", "body", "type",
+          "status_code", "msg", "result", "testers")
+
+# 三种典型单元格：JSON / Python literal / querystring
+CELLS = {
+    "json": '{"eid": 1, "name": "红米", "limit": 100, "address": "北京"}',
+    "literal": "{'eid': 1, 'name': '红米', 'limit': 100, 'tags': ('a', 'b')}",
+    "querystring": "eid=1&name=%E7%BA%A2%E7%B1%B3&limit=100&address=beijing",
+}
+
+
+def make_workbook(path, n):
+    """生成 n 行合成用例（与模板同样的列）"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append(HEADER)
+    kinds = list(CELLS)
+    for i in range(n):
+        kind = kinds[i % len(kinds)]
+        ws.append((
+            "Bench", f"bench_case_{i + 1:06d}", f"synthetic {kind} case",
+            "http://127.0.0.1:8000/api/get_event_list/", "get", CELLS[kind],
+            '{"Content-Type": "application/json"}', None, None, 200, "success", None, None,
+        ))
+    wb.save(path)
+    return path
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+class _SyntheticCase(unittest.TestCase):
+    """Synthetic case printing a request/response sized block"""
+
+    PAYLOAD = "x" * 200
+
+    def runTest(self):
+        print("******* Running test case -> bench *********")
+        print("Response JSON:", self.PAYLOAD)
+
+
+def bench_read_data(workdir, n, repeat):
+    path = make_workbook(os.path.join(workdir, f"cases_{n}.xlsx"), n)
+
+    def full():
+        ReadExcel(path).read_data()
+
+    def streaming():
+        with ReadExcel(path, read_only=True) as r:
+            for _ in r.iter_data():
+                pass
+
+    return [("read_data", full, repeat), ("read_data_streaming", streaming, repeat)]
+
+
+def bench_safe_parse(workdir, n, repeat):
+    out = []
+    for kind, cell in CELLS.items():
+        def run(cell=cell):
+            for _ in range(n):
+                safe_parse(cell)
+        out.append((f"safe_parse_{kind}", run, repeat))
+    return out
+
+
+def bench_write_data(workdir, n, repeat):
+    source = os.path.join(workdir, f"cases_{n}.xlsx")
+    if not os.path.exists(source):
+        make_workbook(source, n)
+    target = os.path.join(workdir, f"target_{n}.xlsx")
+
+    def run():
+        shutil.copyfile(source, target)
+        sink = WriteExcel(target, buffered=True)
+        for row in range(2, n + 2):
+            sink.write_data(row, "PASS", status=200, message="success", latency=1.5)
+        sink.close()
+
+    return [("write_data_buffered", run, repeat)]
+
+
+def bench_result_and_report(workdir, n, repeat):
+    state = {}
+
+    def capture():
+        suite = unittest.TestSuite(_SyntheticCase() for _ in range(n))
+        runner = htr.HTMLTestRunner(stream=io.BytesIO(), verbosity=0)
+        result = runner.make_result()
+        with contextlib.redirect_stderr(io.StringIO()):
+            runner.execute(suite, result)
+        runner.stopTime = runner.startTime
+        state["runner"], state["result"] = runner, result
+
+    def report():
+        if "result" not in state:
+            capture()
+        runner = state["runner"]
+        runner.stream = io.BytesIO()
+        runner.generateReport(None, state["result"])
+
+    return [("testresult_capture", capture, repeat), ("generate_report", report, repeat)]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def local_target():
+    """在当前进程的后台线程里启动 app.py（uvicorn）"""
+    import uvicorn
+    import app as target_app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(target_app.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("local target API did not start")
+        time.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+def bench_end_to_end(base_url, n, repeat):
+    """真实 Demo_API.test_api 逻辑 + HTMLTestRunner，打本进程内启动的 app.py（只用 GET 用例，结果稳定）"""
+    from urllib.parse import urlparse
+    from lib.sendrequests import CASE_SPEC_KEY
+    from lib.transport import close_transport
+
+    sys.path.insert(0, setting.TEST_CASE)
+    import testAPI
+
+    test_api = testAPI.Demo_API.test_api
+    target = urlparse(base_url).netloc
+    rows = []
+    for row in testAPI.testData:
+        spec = row.get(CASE_SPEC_KEY)
+        if spec and spec["method"].lower() == "get":
+            row = dict(row)
+            row[CASE_SPEC_KEY] = dict(spec, url=spec["url"].replace(urlparse(spec["url"]).netloc, target, 1))
+            rows.append(row)
+
+    class _E2ECase(testAPI.Demo_API):
+        def __init__(self, data):
+            super().__init__("runTest")
+            self.data = data
+
+        def runTest(self):
+            test_api(self, self.data)
+
+    def run():
+        set_result_sink(ResultCollector())
+        suite = unittest.TestSuite(_E2ECase(rows[i % len(rows)]) for i in range(n))
+        runner = htr.HTMLTestRunner(stream=io.BytesIO(), verbosity=0)
+        with contextlib.redirect_stderr(io.StringIO()), contextlib.redirect_stdout(io.StringIO()):
+            result = runner.run(suite)
+        close_transport()
+        set_result_sink(None)
+        if result.failure_count or result.error_count:
+            raise RuntimeError(f"end-to-end benchmark had {result.failure_count + result.error_count} failing cases")
+
+    return [("end_to_end", run, repeat)]
+
+
+def run_benchmarks(sizes, repeat, e2e_cases, workdir):
+    results = []
+
+    def record(bench, n, fn, r):
+        samples = timed(fn, r)
+        best = min(samples)
+        results.append({
+            "bench": bench,
+            "cases": n,
+            "repeat": r,
+            "seconds": round(best, 6),
+            "median_seconds": round(statistics.median(samples), 6),
+            "per_case_us": round(best / n * 1e6, 3),
+        })
+        print(f"{bench:<24} {n:>8} cases  best={best:9.4f}s  per_case={best / n * 1e6:9.2f}us")
+
+    for n in sizes:
+        for factory in (bench_read_data, bench_safe_parse, bench_write_data, bench_result_and_report):
+            for bench, fn, r in factory(workdir, n, repeat):
+                record(bench, n, fn, r)
+
+    if e2e_cases:
+        os.environ.setdefault("DOCKER_URL_HOST", "127.0.0.1")
+        with local_target() as base_url:
+            for bench, fn, r in bench_end_to_end(base_url, e2e_cases, repeat):
+                record(bench, e2e_cases, fn, r)
+    return results
+
+
+def compare(results, baseline_path, tolerance):
+    """与基线比较 per_case_us，超过 (1 + tolerance) 倍算回归"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["bench"], r["cases"]): r for r in json.load(f).get("results", [])}
+    regressions = []
+    for r in results:
+        base = baseline.get((r["bench"], r["cases"]))
+        if base and base["per_case_us"] > 0 and r["per_case_us"] > base["per_case_us"] * (1 + tolerance):
+            regressions.append((r["bench"], r["cases"], base["per_case_us"], r["per_case_us"]))
+    if regressions:
+        print("----- HARNESS REGRESSIONS -----")
+        print(f"{'bench':<24} {'cases':>8} {'baseline(us)':>13} {'current(us)':>12} {'ratio':>7}")
+        for bench, n, old, new in regressions:
+            print(f"{bench:<24} {n:>8} {old:>13.2f} {new:>12.2f} {new / old:>7.2f}")
+    return regressions
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Framework overhead benchmarks")
+    p.add_argument("--sizes", default="1000,10000,100000", help="comma separated synthetic case counts")
+    p.add_argument("--repeat", type=int, default=3, help="runs per benchmark (best is reported)")
+    p.add_argument("--e2e-cases", type=int, default=1000, help="end-to-end cases against app.py (0 = skip)")
+    p.add_argument("--output", default=None, help="JSON output path (default report/benchmark/<time>_bench.json)")
+    p.add_argument("--baseline", default=None, help="previous JSON result to compare against")
+    p.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+
+    workdir = tempfile.mkdtemp(prefix="apitest_bench_")
+    try:
+        results = run_benchmarks(sizes, max(args.repeat, 1), args.e2e_cases, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    payload = {
+        "schema": SCHEMA_VERSION,
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "html_test_runner": htr.__version__,
+            "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": sorted(results, key=lambda r: (r["bench"], r["cases"])),
+    }
+    output = args.output or os.path.join(
+        setting.TEST_REPORT, "benchmark", time.strftime("%Y-%m-%d_%H_%M_%S") + "_bench.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    print(f"BENCH_RESULT_PATH={os.path.abspath(output)}")
+
+    if args.baseline:
+        return 1 if compare(payload["results"], args.baseline, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,11 +17,69 @@ if not os.path.exists(TEST_CONFIG) and os.path.exists(TEST_CONFIG_EXAMPLE):
 # Test case template file
 SOURCE_FILE = os.path.join(BASE_DIR, "database", "DemoAPITestCase.xlsx")
 
-# Excel test case result file (generated locally)
-TARGET_FILE = os.path.join(BASE_DIR, "report", "excelReport", "DemoAPITestCase.xlsx")
+# Excel test case result file (generated locally; TARGET_FILE env overrides, e.g. per trigger job)
+TARGET_FILE = os.getenv("TARGET_FILE") or os.path.join(BASE_DIR, "report", "excelReport", "DemoAPITestCase.xlsx")
 
 # Test report output dir (generated locally)
 TEST_REPORT = os.path.join(BASE_DIR, "report")
 
 # Test case scripts dir
 TEST_CASE = os.path.join(BASE_DIR, "testcase")
+
+# Excel result write-back (buffered sink)
+# - 0 = only flush once at suite end
+# - EXCEL_FLUSH_ROWS: flush every K rows; EXCEL_FLUSH_SECONDS: flush every T seconds
+EXCEL_FLUSH_ROWS = int(os.getenv("EXCEL_FLUSH_ROWS", "0") or 0)
+EXCEL_FLUSH_SECONDS = float(os.getenv("EXCEL_FLUSH_SECONDS", "0") or 0)
+
+# Compiled case cache (parsed Excel rows, keyed on the source xlsx size/mtime/sha256)
+CASE_CACHE = os.getenv("CASE_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+CASE_CACHE_DIR = os.getenv("CASE_CACHE_DIR") or os.path.join(TEST_REPORT, ".cache")
+
+# Shared HTTP transport (keep-alive connection pool reused across cases)
+# - HTTP_POOL_CONNECTIONS: number of per-host pools to keep
+# - HTTP_POOL_MAXSIZE: max connections kept per host (raised to --workers when larger)
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10") or 10)
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10") or 10)
+
+# Target API data namespace (app.py): every request carries RUN_ID_HEADER when RUN_ID is set,
+# so parallel runs / shards get isolated datasets (run_demo.py --namespace allocates one)
+RUN_ID_HEADER = "X-Run-Id"
+
+# Captured test output (HTMLTestRunner): per-case cap in characters (keeps head + tail),
+# suite-wide budget for output kept in memory until the report is written; 0 = unlimited.
+# CAPTURE_SPILL=1 writes oversized output in full to report/<time>_output/<test id>.log
+CAPTURE_CASE_LIMIT = int(os.getenv("CAPTURE_CASE_LIMIT", str(256 * 1024)) or 0)
+CAPTURE_BUDGET = int(os.getenv("CAPTURE_BUDGET", str(64 * 1024 * 1024)) or 0)
+CAPTURE_SPILL = os.getenv("CAPTURE_SPILL", "0").strip().lower() in ("1", "true", "yes", "on")
+
+# JSON codec (lib/jsoncodec.py): auto = orjson when installed, else stdlib json; or force "orjson" / "json"
+JSON_CODEC = os.getenv("JSON_CODEC", "auto")
+
+# Results history (lib/history.py): run_demo.py --history appends every run to this SQLite file
+HISTORY_DB = os.getenv("HISTORY_DB") or os.path.join(TEST_REPORT, "history.sqlite3")
+
+# Latency regression gate (lib/perfgate.py, run_demo.py --perf-gate)
+# - PERF_SAMPLES: extra sequential requests per passing case (plus the functional run's own sample)
+# - a case / endpoint regresses when p50 > baseline * PERF_P50_RATIO or p95 > baseline * PERF_P95_RATIO,
+#   and the increase is more than PERF_MIN_DELTA_MS
+PERF_SAMPLES = int(os.getenv("PERF_SAMPLES", "5") or 0)
+PERF_P50_RATIO = float(os.getenv("PERF_P50_RATIO", "1.5") or 1.5)
+PERF_P95_RATIO = float(os.getenv("PERF_P95_RATIO", "2.0") or 2.0)
+PERF_MIN_DELTA_MS = float(os.getenv("PERF_MIN_DELTA_MS", "5") or 0)
+
+# Request timeouts / retries / circuit breaker (lib/resilience.py, used by SendRequests)
+# - HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT: seconds; the optional Excel column "timeout" overrides per row
+#   ("10" = read timeout, "3,10" = connect,read)
+# - HTTP_RETRIES: extra attempts for idempotent methods on connection errors / timeouts / HTTP_RETRY_STATUS,
+#   waiting uniform(0, min(HTTP_RETRY_BACKOFF_MAX, HTTP_RETRY_BACKOFF * 2^n)) seconds before retry n
+# - CIRCUIT_FAILURES: consecutive failed attempts before a host's circuit opens and remaining cases fast-fail
+#   (0 = disabled); CIRCUIT_RESET_SECONDS: cool-down before one trial request is let through
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5") or 5)
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30") or 30)
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2") or 0)
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.2") or 0)
+HTTP_RETRY_BACKOFF_MAX = float(os.getenv("HTTP_RETRY_BACKOFF_MAX", "5") or 0)
+HTTP_RETRY_STATUS = frozenset(int(x) for x in os.getenv("HTTP_RETRY_STATUS", "500,502,503,504").split(",") if x.strip())
+CIRCUIT_FAILURES = int(os.getenv("CIRCUIT_FAILURES", "5") or 0)
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30") or 0)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+import os
+import pickle
+import hashlib
+
+from config import setting
+from lib.readexcel import ReadExcel
+from lib.sendrequests import CASE_SPEC_KEY, build_request_spec
+
+# 缓存格式变化时 +1，旧 sidecar 自动失效
+CACHE_VERSION = 3
+
+
+def _file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_path(source_file, sheet_name, cache_dir=None):
+    cache_dir = cache_dir or setting.CASE_CACHE_DIR
+    name = os.path.splitext(os.path.basename(source_file))[0]
+    return os.path.join(cache_dir, f"{name}.{sheet_name}.cases")
+
+
+def compile_cases(source_file, sheet_name="Sheet1"):
+    """读取 Excel，并把每一行的 params/headers/body 预解析成请求参数"""
+    with ReadExcel(source_file, sheet_name, read_only=True) as reader:
+        rows = reader.read_data() or []
+    for row in rows:
+        row[CASE_SPEC_KEY] = build_request_spec(row)
+    return rows
+
+
+def _read_meta(path):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def _load_rows(path):
+    with open(path, "rb") as f:
+        pickle.load(f)  # meta
+        return pickle.load(f)
+
+
+def _write(path, meta, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_cases(source_file, sheet_name="Sheet1", cache_dir=None):
+    """返回预解析好的 case 列表；优先读 sidecar 缓存
+
+    缓存 key：源文件 size + mtime（快速判断），不一致时再比 sha256，
+    内容没变只刷新 meta，内容变了才重新解析 Excel。
+    """
+    if not setting.CASE_CACHE:
+        return compile_cases(source_file, sheet_name)
+
+    path = cache_path(source_file, sheet_name, cache_dir)
+    st = os.stat(source_file)
+    meta = _read_meta(path)
+    digest = None
+
+    if meta and meta.get("version") == CACHE_VERSION:
+        try:
+            if (meta.get("size"), meta.get("mtime_ns")) == (st.st_size, st.st_mtime_ns):
+                return _load_rows(path)
+
+            digest = _file_sha256(source_file)
+            if meta.get("sha256") == digest:
+                rows = _load_rows(path)
+                meta.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                _write(path, meta, rows)
+                return rows
+        except Exception as e:
+            print(f"[WARN] case cache unreadable, rebuilding -> {e} (path={path})")
+
+    rows = compile_cases(source_file, sheet_name)
+    meta = {
+        "version": CACHE_VERSION,
+        "source": os.path.abspath(source_file),
+        "sheet": sheet_name,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": digest or _file_sha256(source_file),
+    }
+    try:
+        _write(path, meta, rows)
+    except Exception as e:
+        print(f"[WARN] Failed to write case cache: {e}")
+    return rows
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+"""
+录制 / 回放（run_demo.py --record-cassette / --replay-cassette）。
+
+record: 共享 transport 换成 RecordingAdapter，照常发请求，同时把每对请求 / 响应存下来，run 结束写成 cassette 文件
+replay: 换成 CassetteAdapter，响应直接从 mmap 的 cassette 里取，不建任何 socket；找不到的请求记为 miss 并报错
+
+key = hash(method + path + 排序后的 query + 规范化后的 body)，不含 scheme/host（本地录的 cassette 在 docker 里也能用）
+和 X-Run-Id 等 header。同一个 key 录到多个响应时按顺序回放，用完后一直返回最后一个。
+
+文件格式（little-endian）：
+    MAGIC | record... | index | footer
+    record = <HHII status, len(reason), len(headers json), len(content)> reason headers content
+    index  = 每个 key：16 字节 key, <I 响应数>, 每个响应 <QI offset, length>
+    footer = <QI index offset, key 数> MAGIC
+"""
+
+import os
+import json
+import mmap
+import struct
+import hashlib
+import datetime
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from lib.transport import InstrumentedAdapter
+
+MAGIC = b"APICASS1"
+_RECORD = struct.Struct("<HHII")
+_ENTRY = struct.Struct("<QI")
+_COUNT = struct.Struct("<I")
+_FOOTER = struct.Struct("<QI8s")
+KEY_SIZE = 16
+
+
+class CassetteMiss(requests.ConnectionError):
+    pass
+
+
+def _canonical_body(body, content_type):
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    elif not isinstance(body, (bytes, bytearray)):
+        # 文件 / 生成器：不参与 key
+        return b"<stream>"
+    content_type = (content_type or "").lower()
+    if "json" in content_type:
+        try:
+            return json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+        except ValueError:
+            return bytes(body)
+    if "x-www-form-urlencoded" in content_type:
+        return urlencode(sorted(parse_qsl(body.decode("latin-1"), keep_blank_values=True))).encode("latin-1")
+    return bytes(body)
+
+
+def request_key(request):
+    """PreparedRequest -> 16 字节 key"""
+    parts = urlsplit(request.url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    h = hashlib.blake2b(digest_size=KEY_SIZE)
+    for chunk in (request.method.upper().encode("ascii"), parts.path.encode("utf-8"), query.encode("utf-8"),
+                  _canonical_body(request.body, request.headers.get("Content-Type"))):
+        h.update(chunk)
+        h.update(b"\0")
+    return h.digest()
+
+
+def _describe(request):
+    parts = urlsplit(request.url)
+    return f"{request.method.upper()} {parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+
+def _pack(status, reason, headers, content):
+    reason = (reason or "").encode("utf-8")
+    headers = json.dumps(list(headers.items()), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    content = content or b""
+    return _RECORD.pack(status, len(reason), len(headers), len(content)) + reason + headers + content
+
+
+class CassetteWriter:
+    """录制：响应先留在内存，close() 时一次写盘（临时文件 + rename）"""
+
+    mode = "record"
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def record(self, request, resp):
+        item = (request_key(request), _pack(resp.status_code, resp.reason, resp.headers, resp.content))
+        with self._lock:
+            self.entries.append(item)
+
+    def export(self):
+        """多进程：子进程把录到的条目交回父进程"""
+        with self._lock:
+            entries, self.entries = self.entries, []
+        return entries
+
+    def merge(self, entries):
+        with self._lock:
+            self.entries.extend(entries)
+
+    def close(self):
+        with self._lock:
+            entries, self.entries = self.entries, []
+        index = {}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            for key, blob in entries:
+                index.setdefault(key, []).append((f.tell(), len(blob)))
+                f.write(blob)
+            index_offset = f.tell()
+            for key, spans in index.items():
+                f.write(key + _COUNT.pack(len(spans)))
+                for span in spans:
+                    f.write(_ENTRY.pack(*span))
+            f.write(_FOOTER.pack(index_offset, len(index), MAGIC))
+        os.replace(tmp, self.path)
+        return {"mode": self.mode, "path": self.path, "requests": len(entries), "keys": len(index), "misses": 0}
+
+
+class CassetteReader:
+    """回放：索引读进内存，响应体留在 mmap 里按需切片"""
+
+    mode = "replay"
+
+    def __init__(self, path):
+        self.path = path
+        self._fp = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._fp.close()
+            raise ValueError(f"not a cassette file: {path}") from None
+        magic = None
+        if len(self._mm) >= len(MAGIC) + _FOOTER.size:
+            index_offset, keys, magic = _FOOTER.unpack_from(self._mm, len(self._mm) - _FOOTER.size)
+        if self._mm[:len(MAGIC)] != MAGIC or magic != MAGIC:
+            self._mm.close()
+            self._fp.close()
+            raise ValueError(f"not a cassette file: {path}")
+
+        self.index = {}
+        pos = index_offset
+        for _ in range(keys):
+            key = self._mm[pos:pos + KEY_SIZE]
+            (count,) = _COUNT.unpack_from(self._mm, pos + KEY_SIZE)
+            pos += KEY_SIZE + _COUNT.size
+            self.index[key] = [_ENTRY.unpack_from(self._mm, pos + i * _ENTRY.size) for i in range(count)]
+            pos += count * _ENTRY.size
+
+        self.served = 0
+        self.misses = {}
+        self._cursor = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, request):
+        """返回 (status, reason, headers, content)；cassette 里没有时返回 None 并记一次 miss"""
+        key = request_key(request)
+        spans = self.index.get(key)
+        with self._lock:
+            if spans is None:
+                what = _describe(request)
+                self.misses[what] = self.misses.get(what, 0) + 1
+                return None
+            n = self._cursor.get(key, 0)
+            self._cursor[key] = n + 1
+            self.served += 1
+        offset, _ = spans[min(n, len(spans) - 1)]
+        status, reason_len, headers_len, content_len = _RECORD.unpack_from(self._mm, offset)
+        pos = offset + _RECORD.size
+        reason = self._mm[pos:pos + reason_len].decode("utf-8")
+        pos += reason_len
+        headers = json.loads(self._mm[pos:pos + headers_len])
+        pos += headers_len
+        return status, reason, headers, self._mm[pos:pos + content_len]
+
+    def export(self):
+        """多进程：子进程把回放计数 / miss 交回父进程"""
+        with self._lock:
+            stats = {"served": self.served, "misses": dict(self.misses)}
+            self.served, self.misses = 0, {}
+        return stats
+
+    def merge(self, stats):
+        with self._lock:
+            self.served += stats["served"]
+            for what, count in stats["misses"].items():
+                self.misses[what] = self.misses.get(what, 0) + count
+
+    def close(self):
+        if not self._mm.closed:
+            self._mm.close()
+        self._fp.close()
+        with self._lock:
+            misses = sum(self.misses.values())
+        return {"mode": self.mode, "path": self.path, "requests": self.served, "keys": len(self.index),
+                "misses": misses, "missed": dict(self.misses)}
+
+
+class RecordingAdapter(InstrumentedAdapter):
+    """照常发请求（保留连接计时 / 复用统计），同时把请求 / 响应交给 CassetteWriter"""
+
+    def __init__(self, writer, **kwargs):
+        self.writer = writer
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        resp = super().send(request, **kwargs)
+        self.writer.record(request, resp)
+        return resp
+
+
+class CassetteAdapter(BaseAdapter):
+    """不联网：从 CassetteReader 组装 requests.Response"""
+
+    offline = True
+
+    def __init__(self, reader):
+        super().__init__()
+        self.reader = reader
+
+    def send(self, request, **kwargs):
+        hit = self.reader.lookup(request)
+        if hit is None:
+            raise CassetteMiss(f"request not in cassette {self.reader.path}: {_describe(request)}", request=request)
+        status, reason, headers, content = hit
+        resp = requests.Response()
+        resp.status_code = status
+        resp.reason = reason
+        resp.headers = CaseInsensitiveDict(headers)
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp._content = content
+        resp._content_consumed = True
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        resp.elapsed = datetime.timedelta(0)
+        return resp
+
+    def close(self):
+        pass
+
+
+# ====== 当前 run 的 cassette（Transport 创建 adapter 时读取）======
+_cassette = None
+
+
+def open_cassette(mode, path):
+    """mode: record / replay"""
+    global _cassette
+    if mode == "record":
+        _cassette = CassetteWriter(path)
+    elif mode == "replay":
+        _cassette = CassetteReader(path)
+    else:
+        raise ValueError(f"unknown cassette mode: {mode!r}")
+    return _cassette
+
+
+def get_cassette():
+    return _cassette
+
+
+def close_cassette():
+    """写盘（record）/ 释放 mmap（replay），返回统计；没有打开过则返回 None"""
+    global _cassette
+    cassette, _cassette = _cassette, None
+    if cassette is None:
+        return None
+    return cassette.close()
+
+
+def make_adapter(**kwargs):
+    """Transport 用：按当前 cassette 模式返回 adapter"""
+    if isinstance(_cassette, CassetteReader):
+        return CassetteAdapter(_cassette)
+    if isinstance(_cassette, CassetteWriter):
+        return RecordingAdapter(_cassette, **kwargs)
+    return InstrumentedAdapter(**kwargs)
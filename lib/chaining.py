@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+"""
+链式 case：从响应里提取变量，后面的请求用 ${var} 引用。
+
+Excel 可选列 extract：`eid=$.data.eid; name=$.data.name`（或 JSON：{"eid": "$.data.eid"}），
+case 通过后按 JSON path 从响应里取值存入本轮的变量表；url / params / headers / body 里的 ${eid} 发送前替换
+（整个单元格就是 ${var} 时保留原类型，否则按字符串拼接）。
+
+调度：按变量的生产 / 引用关系把 case 连成链（同一个变量的所有生产者也归到同一条链），
+链内按 Excel 顺序串行，不同的链（以及不在任何链里的 case）照常并发。
+"""
+
+import re
+import json
+import threading
+
+# ${var}
+VAR_PATTERN = re.compile(r"\$\{(\w+)\}")
+
+# JSON path 的一段：.key / [0] / ['key']
+_PATH_TOKEN = re.compile(r"\.([^.\[\]]+)|\[(-?\d+)\]|\[(['\"])(.*?)\3\]")
+
+
+class ExtractError(ValueError):
+    pass
+
+
+class UndefinedVariable(KeyError):
+    pass
+
+
+def parse_extract(cell):
+    """extract 单元格 -> {var: path}"""
+    if cell is None or (isinstance(cell, str) and not cell.strip()):
+        return {}
+    if isinstance(cell, str) and cell.strip().startswith("{"):
+        cell = json.loads(cell)
+    if isinstance(cell, dict):
+        items = cell.items()
+    else:
+        items = []
+        for part in re.split(r"[;\n]", str(cell)):
+            if not part.strip():
+                continue
+            name, sep, path = part.partition("=")
+            if not sep:
+                raise ValueError(f"invalid extract entry {part.strip()!r} (expected var=$.path)")
+            items.append((name, path))
+    out = {}
+    for name, path in items:
+        name, path = str(name).strip(), str(path).strip()
+        if not re.fullmatch(r"\w+", name):
+            raise ValueError(f"invalid variable name {name!r} in extract")
+        out[name] = path
+    return out
+
+
+def json_path(obj, path):
+    """取值：$ / $.data.eid / $.data[0].name / $['data']"""
+    path = path.strip()
+    if not path.startswith("$"):
+        raise ExtractError(f"JSON path must start with '$': {path!r}")
+    pos, value = 1, obj
+    while pos < len(path):
+        m = _PATH_TOKEN.match(path, pos)
+        if not m:
+            raise ExtractError(f"invalid JSON path {path!r} at offset {pos}")
+        key, index, quoted = m.group(1), m.group(2), m.group(4)
+        try:
+            if index is not None:
+                value = value[int(index)]
+            else:
+                value = value[key if key is not None else quoted]
+        except (KeyError, IndexError, TypeError):
+            raise ExtractError(f"{path!r} not found in response (stopped at {path[:m.end()]!r})") from None
+        pos = m.end()
+    return value
+
+
+def references(value):
+    """url / params / headers / body 里引用到的变量名"""
+    if isinstance(value, str):
+        return set(VAR_PATTERN.findall(value))
+    if isinstance(value, dict):
+        refs = set()
+        for k, v in value.items():
+            refs |= references(k) | references(v)
+        return refs
+    if isinstance(value, (list, tuple)):
+        refs = set()
+        for v in value:
+            refs |= references(v)
+        return refs
+    return set()
+
+
+def spec_references(spec):
+    return references([spec.get("url"), spec.get("params"), spec.get("headers"), spec.get("body")])
+
+
+class Variables:
+    """本轮运行的变量表（线程共享）"""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            try:
+                return self._values[name]
+            except KeyError:
+                raise UndefinedVariable(
+                    f"variable ${{{name}}} is not defined (the case that extracts it did not pass or has not run)"
+                ) from None
+
+    def update(self, values):
+        with self._lock:
+            self._values.update(values)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+_variables = Variables()
+
+
+def get_variables():
+    return _variables
+
+
+def reset_variables():
+    _variables.clear()
+
+
+def substitute(value, variables):
+    """把 ${var} 换成变量值：整个字符串就是 ${var} 时保留原类型"""
+    if isinstance(value, str):
+        m = VAR_PATTERN.fullmatch(value)
+        if m:
+            return variables.get(m.group(1))
+        return VAR_PATTERN.sub(lambda m: str(variables.get(m.group(1))), value)
+    if isinstance(value, dict):
+        return {substitute(k, variables): substitute(v, variables) for k, v in value.items()}
+    if isinstance(value, list):
+        return [substitute(v, variables) for v in value]
+    if isinstance(value, tuple):
+        return tuple(substitute(v, variables) for v in value)
+    return value
+
+
+def resolve_spec(spec, variables=None):
+    """返回替换好变量的请求参数（不修改缓存里的 spec）"""
+    if not spec.get("refs"):
+        return spec
+    variables = variables or _variables
+    resolved = dict(spec)
+    for key in ("url", "params", "headers", "body"):
+        resolved[key] = substitute(spec[key], variables)
+    return resolved
+
+
+def extract_into(spec, payload, variables=None):
+    """按 spec["extract"] 从响应 JSON 取值写入变量表，返回取到的 {var: value}"""
+    rules = spec.get("extract") or {}
+    if not rules:
+        return {}
+    values = {name: json_path(payload, path) for name, path in rules.items()}
+    (variables or _variables).update(values)
+    return values
+
+
+def build_graph(entries, spec_of):
+    """
+    entries: [(test_id, row), ...]（执行顺序）；spec_of(row) -> 请求参数
+    返回 (chains, deps)：
+      chains: {test_id: chain 编号}，只包含链上的 case（至少两个成员）
+      deps:   {test_id: {上游 test_id, ...}}，每个引用绑定到它之前最近的生产者
+    """
+    parent = {}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a, b):
+        parent[find(a)] = find(b)
+
+    last_producer = {}
+    first_producer = {}
+    deps = {}
+    order = []
+    for test_id, row in entries:
+        if row is None:
+            continue
+        spec = spec_of(row)
+        refs, produces = spec.get("refs") or (), (spec.get("extract") or {}).keys()
+        if not refs and not produces:
+            continue
+        parent.setdefault(test_id, test_id)
+        order.append(test_id)
+        for name in refs:
+            producer = last_producer.get(name)
+            if producer is None:
+                print(f"[WARN] {test_id} references ${{{name}}} but no earlier case extracts it")
+                continue
+            deps.setdefault(test_id, set()).add(producer)
+            union(test_id, producer)
+        for name in produces:
+            union(test_id, first_producer.setdefault(name, test_id))
+            last_producer[name] = test_id
+
+    members = {}
+    for test_id in order:
+        members.setdefault(find(test_id), []).append(test_id)
+    chains = {}
+    for n, ids in enumerate(m for m in members.values() if len(m) > 1):
+        for test_id in ids:
+            chains[test_id] = n
+    return chains, deps
+
+
+def upstream(test_ids, deps):
+    """test_ids 加上它们（传递）依赖的所有上游 case"""
+    seen = set(test_ids)
+    stack = list(seen)
+    while stack:
+        for producer in deps.get(stack.pop(), ()):
+            if producer not in seen:
+                seen.add(producer)
+                stack.append(producer)
+    return seen
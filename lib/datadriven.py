@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+"""
+数据驱动用例的懒加载（替代 ddt）。
+
+ddt 在 import 时为每一行数据生成一个方法，discover 再为每个方法建一个 TestCase；
+行数上万时类创建 / discover / suite 对象图本身就要几秒。这里改成：
+
+    @data(rows)                       # rows: list / 可迭代对象 / 返回可迭代对象的函数
+    def test_api(self, row): ...
+
+    def load_tests(loader, tests, pattern):
+        return expand_data_tests(tests)
+
+discover 只拿到一个 DataSuite，runner 迭代时才逐行创建 TestCase，
+名字与 ddt 保持一致（test_api_01 ...），报告 / Excel / 多进程切片都按这个名字和顺序对应。
+"""
+
+import functools
+import unittest
+
+DATA_ATTR = "__data_rows__"
+
+
+def data(rows):
+    """标记数据驱动的用例方法：每一行数据作为参数调用一次"""
+    def wrapper(func):
+        setattr(func, DATA_ATTR, rows)
+        return func
+    return wrapper
+
+
+def make_case(cls, method_name, test_name, row):
+    """创建一条用例：test_name 是对外的名字（id / 报告），实际调用 method_name(row)"""
+    case = cls(method_name)
+    case.data_row = row
+    method = getattr(case, method_name)
+    bound = functools.update_wrapper(functools.partial(method, row), method)
+    case._testMethodName = test_name
+    setattr(case, test_name, bound)
+    return case
+
+
+class DataSuite(unittest.TestSuite):
+    """一个数据驱动方法对应的 suite：不持有用例对象，迭代时按行即时创建"""
+
+    def __init__(self, cls, method_name, rows, only=None):
+        super().__init__()
+        self.cls = cls
+        self.method_name = method_name
+        self.rows = rows
+        # 只产出这些 test id（subset() 用）；None = 全部
+        self.only = only
+
+    def _rows(self):
+        return self.rows() if callable(self.rows) else self.rows
+
+    def iter_rows(self):
+        """(test_id, test_name, row)：不创建用例对象"""
+        rows = self._rows()
+        # 与 ddt 的命名一致：序号从 1 开始，按总行数补零
+        width = len(str(len(rows))) if hasattr(rows, "__len__") else 1
+        prefix = f"{self.cls.__module__}.{self.cls.__qualname__}."
+        for index, row in enumerate(rows, 1):
+            name = f"{self.method_name}_{index:0{width}d}"
+            if self.only is None or prefix + name in self.only:
+                yield prefix + name, name, row
+
+    def __iter__(self):
+        for _, name, row in self.iter_rows():
+            yield make_case(self.cls, self.method_name, name, row)
+
+    def countTestCases(self):
+        if self.only is None and hasattr(self._rows(), "__len__"):
+            return len(self._rows())
+        return sum(1 for _ in self.iter_rows())
+
+    def addTest(self, test):
+        raise TypeError("DataSuite is generated from rows; wrap it in a TestSuite to add tests")
+
+    def _removeTestAtIndex(self, index):
+        # TestSuite.run 跑完一条就释放引用；这里本来就不持有用例
+        pass
+
+    def __repr__(self):
+        return f"<DataSuite {self.cls.__module__}.{self.cls.__qualname__}.{self.method_name}>"
+
+
+def iter_entries(suite):
+    """按执行顺序产出 (test_id, row)；数据驱动用例不创建对象，普通用例 row 为 None"""
+    if isinstance(suite, DataSuite):
+        for test_id, _, row in suite.iter_rows():
+            yield test_id, row
+    elif isinstance(suite, unittest.TestSuite):
+        for test in suite:
+            yield from iter_entries(test)
+    else:
+        yield suite.id(), getattr(suite, "data_row", None)
+
+
+def subset(suite, test_ids):
+    """保持原有结构（class / module fixture）与顺序，只留下 test_ids 里的用例"""
+    return _subset(suite, frozenset(test_ids))
+
+
+def _subset(suite, test_ids):
+    if isinstance(suite, DataSuite):
+        only = test_ids if suite.only is None else suite.only & test_ids
+        return DataSuite(suite.cls, suite.method_name, suite.rows, only=only)
+    if isinstance(suite, unittest.TestSuite):
+        return unittest.TestSuite(_subset(test, test_ids) for test in suite)
+    return suite if suite.id() in test_ids else unittest.TestSuite()
+
+
+def expand_data_tests(tests):
+    """load_tests 用：把标准 loader 找到的 @data 方法替换成 DataSuite，其他用例原样保留"""
+    suite = unittest.TestSuite()
+    for test in tests:
+        if isinstance(test, unittest.TestSuite):
+            suite.addTest(expand_data_tests(test))
+            continue
+        method = getattr(type(test), test._testMethodName, None)
+        rows = getattr(method, DATA_ATTR, None)
+        if rows is None:
+            suite.addTest(test)
+        else:
+            suite.addTest(DataSuite(type(test), test._testMethodName, rows))
+    return suite
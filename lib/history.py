@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+"""
+跨运行的结果历史（SQLite，本地文件，不需要额外服务）。
+
+run_demo.py --history 在每轮结束后写入：一行 run 元数据 + 每个 case 的状态 / 耗时 / 响应大小。
+查询：
+    python lib/history.py slowest  --runs 20 --top 10
+    python lib/history.py trends   --runs 20 [--case event_query_001]
+    python lib/history.py flakiest --runs 50
+"""
+
+import os
+import sys
+import json
+import socket
+import sqlite3
+import argparse
+import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import setting
+from lib.metrics import STATUS, percentile
+
+SCHEMA_VERSION = 1
+
+# executemany 每批的行数
+INSERT_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at    TEXT NOT NULL,
+    finished_at   TEXT NOT NULL,
+    title         TEXT,
+    host          TEXT,
+    base_url      TEXT,
+    run_namespace TEXT,
+    args          TEXT,
+    tests_run     INTEGER,
+    failures      INTEGER,
+    errors        INTEGER,
+    skipped       INTEGER,
+    report_path   TEXT
+);
+CREATE TABLE IF NOT EXISTS case_results (
+    run_id         INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    case_id        TEXT NOT NULL,
+    test           TEXT NOT NULL,
+    status         TEXT NOT NULL,
+    duration_ms    REAL,
+    http_status    INTEGER,
+    total_ms       REAL,
+    ttfb_ms        REAL,
+    connect_ms     REAL,
+    request_bytes  INTEGER,
+    response_bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs (started_at);
+CREATE INDEX IF NOT EXISTS idx_case_results_case ON case_results (case_id, run_id);
+CREATE INDEX IF NOT EXISTS idx_case_results_run ON case_results (run_id);
+"""
+
+
+def connect(path=None):
+    path = path or setting.HISTORY_DB
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    return conn
+
+
+def _case_rows(result):
+    """(test, status)：运行过的 + 跳过的"""
+    for n, test, _, _ in result.result:
+        yield test, STATUS.get(n, str(n))
+    for test, _ in result.skipped:
+        yield test, "SKIP"
+
+
+def record_run(result, started_at, meta=None, case_keys=None, path=None):
+    """把一轮结果写入历史库，返回 run id；case_keys: {test_id: (case key, hash)}（selection.select_cases）"""
+    meta = meta or {}
+    case_keys = case_keys or {}
+    conn = connect(path)
+    try:
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO runs (started_at, finished_at, title, host, base_url, run_namespace, args,"
+                " tests_run, failures, errors, skipped, report_path) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                (
+                    started_at.isoformat(timespec="seconds"),
+                    datetime.datetime.now().isoformat(timespec="seconds"),
+                    meta.get("title"),
+                    socket.gethostname(),
+                    meta.get("base_url"),
+                    os.getenv("RUN_ID"),
+                    json.dumps(meta.get("args") or [], ensure_ascii=False),
+                    result.testsRun,
+                    len(result.failures),
+                    len(result.errors),
+                    len(result.skipped),
+                    meta.get("report_path"),
+                ),
+            )
+            run_id = cur.lastrowid
+
+            batch = []
+            for test, status in _case_rows(result):
+                test_id = test.id()
+                m = getattr(test, "metrics", None) or {}
+                duration = getattr(test, "duration", None)
+                batch.append((
+                    run_id,
+                    case_keys.get(test_id, (m.get("case_id") or test_id,))[0],
+                    test_id,
+                    status,
+                    round(duration * 1000, 3) if duration is not None else None,
+                    m.get("http_status"),
+                    m.get("total_ms"),
+                    m.get("ttfb_ms"),
+                    m.get("connect_ms"),
+                    m.get("request_bytes"),
+                    m.get("response_bytes"),
+                ))
+                if len(batch) >= INSERT_BATCH:
+                    conn.executemany("INSERT INTO case_results VALUES (?,?,?,?,?,?,?,?,?,?,?)", batch)
+                    batch = []
+            if batch:
+                conn.executemany("INSERT INTO case_results VALUES (?,?,?,?,?,?,?,?,?,?,?)", batch)
+        return run_id
+    finally:
+        conn.close()
+
+
+# ====== 查询 ======
+
+def _last_runs(conn, runs):
+    rows = conn.execute("SELECT id, started_at FROM runs ORDER BY started_at DESC, id DESC LIMIT ?", (runs,))
+    return list(reversed(rows.fetchall()))
+
+
+def _samples(conn, run_ids, case_id=None):
+    """{case_id: [(run_id, status, total_ms, response_bytes), ...]}（按 run 先后）"""
+    if not run_ids:
+        return {}
+    marks = ",".join("?" * len(run_ids))
+    sql = (f"SELECT case_id, run_id, status, total_ms, response_bytes FROM case_results "
+           f"WHERE run_id IN ({marks})")
+    params = list(run_ids)
+    if case_id:
+        sql += " AND case_id = ?"
+        params.append(case_id)
+    out = {}
+    for cid, run_id, status, total_ms, size in conn.execute(sql + " ORDER BY run_id", params):
+        out.setdefault(cid, []).append((run_id, status, total_ms, size))
+    return out
+
+
+def slowest(conn, runs=20, top=10):
+    run_ids = [r[0] for r in _last_runs(conn, runs)]
+    rows = []
+    for cid, samples in _samples(conn, run_ids).items():
+        values = sorted(s[2] for s in samples if s[2] is not None)
+        if not values:
+            continue
+        sizes = [s[3] for s in samples if s[3] is not None]
+        rows.append({
+            "case_id": cid,
+            "samples": len(values),
+            "mean_ms": round(sum(values) / len(values), 3),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "max_ms": values[-1],
+            "avg_bytes": int(sum(sizes) / len(sizes)) if sizes else None,
+        })
+    rows.sort(key=lambda r: r["p95_ms"], reverse=True)
+    return rows[:top]
+
+
+def trends(conn, runs=20, case_id=None, top=20):
+    """每个 case：前一半 run 与后一半 run 的平均耗时对比（--case 时给出逐次明细）"""
+    last = _last_runs(conn, runs)
+    started = dict(last)
+    samples = _samples(conn, [r[0] for r in last], case_id)
+    if case_id:
+        return [
+            {"run_id": run_id, "started_at": started[run_id], "status": status, "total_ms": total_ms,
+             "response_bytes": size}
+            for run_id, status, total_ms, size in samples.get(case_id, [])
+        ]
+    rows = []
+    for cid, items in samples.items():
+        values = [s[2] for s in items if s[2] is not None]
+        if len(values) < 2:
+            continue
+        half = len(values) // 2
+        older = sum(values[:half]) / half
+        newer = sum(values[half:]) / (len(values) - half)
+        rows.append({
+            "case_id": cid,
+            "samples": len(values),
+            "older_ms": round(older, 3),
+            "newer_ms": round(newer, 3),
+            "change_pct": round((newer - older) / older * 100, 1) if older else None,
+            "last_ms": values[-1],
+        })
+    rows.sort(key=lambda r: r["change_pct"] or 0, reverse=True)
+    return rows[:top]
+
+
+def flakiest(conn, runs=50, top=10):
+    """结果在 PASS 与 FAIL/ERROR 之间来回切换的 case（按切换次数排序）"""
+    run_ids = [r[0] for r in _last_runs(conn, runs)]
+    rows = []
+    for cid, items in _samples(conn, run_ids).items():
+        statuses = [s[1] for s in items if s[1] != "SKIP"]
+        failed = sum(1 for s in statuses if s in ("FAIL", "ERROR"))
+        if not failed or failed == len(statuses):
+            continue
+        flips = sum(1 for a, b in zip(statuses, statuses[1:]) if (a == "PASS") != (b == "PASS"))
+        rows.append({
+            "case_id": cid,
+            "runs": len(statuses),
+            "failed": failed,
+            "fail_rate_pct": round(failed / len(statuses) * 100, 1),
+            "flips": flips,
+            "last_status": statuses[-1],
+        })
+    rows.sort(key=lambda r: (r["flips"], r["fail_rate_pct"]), reverse=True)
+    return rows[:top]
+
+
+def case_durations(conn, runs=20):
+    """{case_id: 平均耗时（秒）}：最近 runs 次运行里跑过（非 SKIP）的 case，--shard-balance 用"""
+    run_ids = [r[0] for r in _last_runs(conn, runs)]
+    if not run_ids:
+        return {}
+    marks = ",".join("?" * len(run_ids))
+    rows = conn.execute(
+        f"SELECT case_id, AVG(duration_ms) FROM case_results WHERE run_id IN ({marks}) "
+        f"AND status != 'SKIP' AND duration_ms IS NOT NULL GROUP BY case_id",
+        run_ids,
+    )
+    return {case_id: avg / 1000.0 for case_id, avg in rows}
+
+
+def print_table(rows, columns):
+    if not rows:
+        print("(no data)")
+        return
+    widths = {c: max(len(c), *(len(str(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(str(r.get(c)).ljust(widths[c]) for c in columns))
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Query the run_demo.py results history")
+    p.add_argument("--db", default=setting.HISTORY_DB, help="history database (default setting.HISTORY_DB)")
+    sub = p.add_subparsers(dest="command", required=True)
+    q = sub.add_parser("slowest", help="slowest cases by p95 latency")
+    q.add_argument("--runs", type=int, default=20)
+    q.add_argument("--top", type=int, default=10)
+    q = sub.add_parser("trends", help="latency change between older and newer runs")
+    q.add_argument("--runs", type=int, default=20)
+    q.add_argument("--top", type=int, default=20)
+    q.add_argument("--case", default=None, help="show every run for one case ID")
+    q = sub.add_parser("flakiest", help="cases flipping between pass and fail")
+    q.add_argument("--runs", type=int, default=50)
+    q.add_argument("--top", type=int, default=10)
+    args = p.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"[ERROR] history database not found: {args.db}")
+        return 2
+    conn = connect(args.db)
+    try:
+        if args.command == "slowest":
+            print_table(slowest(conn, args.runs, args.top),
+                        ("case_id", "samples", "mean_ms", "p50_ms", "p95_ms", "max_ms", "avg_bytes"))
+        elif args.command == "trends" and args.case:
+            print_table(trends(conn, args.runs, args.case),
+                        ("run_id", "started_at", "status", "total_ms", "response_bytes"))
+        elif args.command == "trends":
+            print_table(trends(conn, args.runs, top=args.top),
+                        ("case_id", "samples", "older_ms", "newer_ms", "change_pct", "last_ms"))
+        else:
+            print_table(flakiest(conn, args.runs, args.top),
+                        ("case_id", "runs", "failed", "fail_rate_pct", "flips", "last_status"))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
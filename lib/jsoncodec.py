@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+"""
+JSON 编解码统一入口（SendRequests / testAPI / app.py 共用）。
+
+装了 orjson 就用 orjson，否则回退到标准库；setting.JSON_CODEC 可强制指定（auto / orjson / json）。
+输出格式与 Starlette 的 JSONResponse 一致：紧凑分隔符、不转义非 ASCII。
+"""
+
+import json
+
+from config import setting
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+class StdlibCodec:
+    name = "json"
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _select(name):
+    name = (name or "auto").strip().lower()
+    if name == "json":
+        return StdlibCodec
+    if name == "orjson" and orjson is None:
+        raise ImportError("JSON_CODEC=orjson but orjson is not installed")
+    return OrjsonCodec if orjson is not None else StdlibCodec
+
+
+codec = _select(setting.JSON_CODEC)
+
+
+def set_codec(name):
+    """切换实现（auto / orjson / json），返回当前 codec"""
+    global codec
+    codec = _select(name)
+    return codec
+
+
+def loads(data):
+    """str / bytes -> 对象；不是合法 JSON 时抛 ValueError"""
+    return codec.loads(data)
+
+
+def dumps(obj):
+    """对象 -> UTF-8 bytes"""
+    return codec.dumps(obj)
+
+
+def response_json(resp):
+    """解析 requests.Response 的 body，结果缓存在 resp 上：同一个响应只解析一次"""
+    try:
+        return resp._decoded_json
+    except AttributeError:
+        pass
+    resp._decoded_json = codec.loads(resp.content)
+    return resp._decoded_json
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+import re
+import json
+import math
+import queue
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+from lib.sendrequests import CASE_SPEC_KEY, SendRequests, build_request_spec
+from lib.transport import close_transport, get_transport
+
+
+def parse_duration(text):
+    """'90' / '30s' / '10m' / '1h' -> 秒"""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*", str(text))
+    if not m:
+        raise ValueError(f"invalid duration: {text!r} (expected e.g. 30s, 10m, 1h)")
+    return float(m.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[m.group(2)]
+
+
+class LatencyHistogram:
+    """对数分桶直方图（约 1% 精度），内存只和桶数有关，和样本数无关"""
+
+    SCALE = 100  # 每个自然对数单位 100 个桶 -> 相邻桶约差 1%
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, ms):
+        us = max(ms * 1000.0, 1.0)
+        b = int(math.log(us) * self.SCALE)
+        self.buckets[b] = self.buckets.get(b, 0) + 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        rank = max(int(math.ceil(p / 100.0 * self.count)), 1)
+        seen = 0
+        for b in sorted(self.buckets):
+            seen += self.buckets[b]
+            if seen >= rank:
+                # 桶上界（保守估计），不超过实际最大值
+                return round(min(math.exp((b + 1) / self.SCALE) / 1000.0, self.max), 3)
+        return round(self.max, 3)
+
+    def summary(self, elapsed):
+        return {
+            "count": self.count,
+            "throughput_rps": round(self.count / elapsed, 2) if elapsed else None,
+            "mean_ms": round(self.total / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class LoadStats:
+    """按 case ID / endpoint / 全局 汇总延迟直方图"""
+
+    def __init__(self):
+        self.overall = LatencyHistogram()
+        self.by_case = {}
+        self.by_endpoint = {}
+        self.errors = {}
+        self.server_errors = 0
+        self.http_status = {}
+        self._lock = threading.Lock()
+
+    def record(self, case_id, endpoint, latency_ms, status):
+        with self._lock:
+            self.overall.record(latency_ms)
+            self.by_case.setdefault(case_id, LatencyHistogram()).record(latency_ms)
+            self.by_endpoint.setdefault(endpoint, LatencyHistogram()).record(latency_ms)
+            self.http_status[str(status)] = self.http_status.get(str(status), 0) + 1
+            # 失败的响应：没拿到响应（连接错误 / 超时 / 熔断）或 5xx
+            if status is None or status >= 500:
+                self.errors[case_id] = self.errors.get(case_id, 0) + 1
+                if status is not None:
+                    self.server_errors += 1
+
+    def report(self, elapsed, scheduled, target_rps):
+        return {
+            "target_rps": target_rps,
+            "scheduled": scheduled,
+            "elapsed_s": round(elapsed, 3),
+            "errors": sum(self.errors.values()),
+            "server_errors": self.server_errors,
+            "http_status": self.http_status,
+            "overall": self.overall.summary(elapsed),
+            "by_case": {k: dict(h.summary(elapsed), errors=self.errors.get(k, 0))
+                        for k, h in sorted(self.by_case.items(), key=lambda kv: str(kv[0]))},
+            "by_endpoint": {k: h.summary(elapsed) for k, h in sorted(self.by_endpoint.items())},
+        }
+
+
+def _case_weight(case):
+    try:
+        w = float(case.get("weight") or 1)
+    except (TypeError, ValueError):
+        w = 1.0
+    return max(w, 0.0)
+
+
+def _endpoint(case):
+    spec = case.get(CASE_SPEC_KEY) or build_request_spec(case)
+    return f"{spec['method'].upper()} {urlparse(spec['url']).path}"
+
+
+def _worker(jobs, stats, sender):
+    s = get_transport().session
+    while True:
+        item = jobs.get()
+        if item is None:
+            return
+        case, endpoint, intended = item
+        resp = sender.sendRequests(s, case)
+        # 延迟从“计划发送时刻”算起：worker 忙不过来时排队时间也计入（避免 coordinated omission）
+        latency_ms = (time.perf_counter() - intended) * 1000
+        stats.record(case.get("ID"), endpoint, latency_ms, getattr(resp, "status_code", None))
+
+
+def run_load(cases, rps, duration, concurrency, seed=None):
+    """
+    开环压测：按固定速率 rps 调度请求（与响应快慢无关），concurrency 个线程执行，
+    case 按 Excel 可选列 weight 加权随机选取。返回汇总 dict。
+    """
+    cases = [c for c in cases if c.get("ID") and c.get("method") and c.get("url")]
+    if not cases:
+        raise ValueError("no runnable cases (rows need ID/method/url)")
+    weights = [_case_weight(c) for c in cases]
+    if not any(weights):
+        raise ValueError("all case weights are 0")
+    endpoints = [_endpoint(c) for c in cases]
+
+    rng = random.Random(seed)
+    indexes = range(len(cases))
+    scheduled = int(rps * duration)
+
+    get_transport(pool_maxsize=concurrency)
+    jobs = queue.Queue()
+    stats = LoadStats()
+    sender = SendRequests(retries=0)
+    workers = [threading.Thread(target=_worker, args=(jobs, stats, sender), daemon=True)
+               for _ in range(concurrency)]
+    for w in workers:
+        w.start()
+
+    start = time.perf_counter()
+    try:
+        for i in range(scheduled):
+            intended = start + i / rps
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            k = rng.choices(indexes, weights=weights)[0]
+            jobs.put((cases[k], endpoints[k], intended))
+    finally:
+        for _ in workers:
+            jobs.put(None)
+        for w in workers:
+            w.join()
+    elapsed = time.perf_counter() - start
+
+    summary = stats.report(elapsed, scheduled, rps)
+    summary["transport"] = close_transport()
+    return summary
+
+
+def print_load_report(summary):
+    def line(name, s):
+        print(f"{str(name)[:48]:<48} {s['count']:>8} {s['throughput_rps'] or 0:>9.1f} "
+              f"{s['p50_ms'] or 0:>9.2f} {s['p95_ms'] or 0:>9.2f} {s['p99_ms'] or 0:>9.2f} {s['max_ms']:>9.2f}")
+
+    header = f"{'':<48} {'count':>8} {'rps':>9} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'max(ms)':>9}"
+    for title, group in (("BY CASE", summary["by_case"]), ("BY ENDPOINT", summary["by_endpoint"])):
+        print(f"----- LOAD {title} -----")
+        print(header)
+        for name, s in group.items():
+            line(name, s)
+    print("----- LOAD SUMMARY -----")
+    print(header)
+    line("overall", summary["overall"])
+    print(f"LOAD_TARGET_RPS={summary['target_rps']}")
+    print(f"LOAD_SCHEDULED={summary['scheduled']}")
+    print(f"LOAD_ELAPSED_S={summary['elapsed_s']}")
+    print(f"LOAD_ERRORS={summary['errors']}")
+    print(f"LOAD_5XX={summary['server_errors']}")
+
+
+def write_load_report(summary, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return path
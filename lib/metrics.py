@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+import json
+import math
+import time
+
+STATUS = {0: "PASS", 1: "FAIL", 2: "ERROR"}
+
+
+def percentile(values, p):
+    """nearest-rank 百分位（values 需已排序）"""
+    if not values:
+        return None
+    k = max(int(math.ceil(p / 100.0 * len(values))) - 1, 0)
+    return values[min(k, len(values) - 1)]
+
+
+def collect(result):
+    """从 _TestResult 里取出每个 case 的请求耗时明细（按 result 顺序）"""
+    records = []
+    for n, test, _, _ in result.result:
+        metrics = getattr(test, "metrics", None) or {}
+        record = {"test": test.id(), "status": STATUS.get(n, str(n))}
+        record.update(metrics)
+        records.append(record)
+    return records
+
+
+def summarize(records, key="total_ms"):
+    values = sorted(r[key] for r in records if r.get(key) is not None)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": values[-1],
+    }
+
+
+def write_metrics_file(result, path):
+    """把每个 case 的 connect/ttfb/total/bytes/reused 写成机器可读的 JSON"""
+    records = collect(result)
+    reused = [r["reused"] for r in records if r.get("reused") is not None]
+    payload = {
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "summary": {
+            "total_ms": summarize(records, "total_ms"),
+            "ttfb_ms": summarize(records, "ttfb_ms"),
+            "connect_ms": summarize(records, "connect_ms"),
+            "request_bytes": sum(r.get("request_bytes") or 0 for r in records),
+            "response_bytes": sum(r.get("response_bytes") or 0 for r in records),
+            "reused_connections": sum(1 for x in reused if x),
+        },
+        "cases": records,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return path
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+"""
+延迟回归门禁（run_demo.py --perf-gate）。
+
+每个通过的 case 在功能测试之后再顺序重发 samples 次，用“功能测试那一次 + 重发”的多个样本算 p50 / p95；
+只重发 GET / HEAD / OPTIONS：POST / PUT / DELETE 重发会改目标数据，而且第二次走的是另一条分支
+（“已存在” / “不存在”），测到的不是同一个请求，这些 case 只用功能测试那一个样本。
+重发的状态码与功能测试那一次不同（限流 429、错误页等）的样本同理丢掉，不算进 p50 / p95。
+然后检查两类阈值：
+    1) Excel 可选列 budget_ms（该 case 的 p95 上限）/ endpoint_budget_ms（同一 endpoint 所有样本的 p95 上限）
+    2) 基线文件（上一次 --perf-update-baseline 写入）：p50 / p95 超过基线的 PERF_P50_RATIO / PERF_P95_RATIO 倍，
+       且绝对增量超过 PERF_MIN_DELTA_MS 才算回归（本机毫秒级的抖动不报）
+"""
+
+import json
+import time
+from urllib.parse import urlparse
+
+from config import setting
+from lib.metrics import percentile
+from lib.resilience import is_safe
+from lib.sendrequests import SendRequests
+from lib.transport import close_transport, get_transport
+
+BASELINE_VERSION = 2
+
+CASE_BUDGET_COLUMN = "budget_ms"
+ENDPOINT_BUDGET_COLUMN = "endpoint_budget_ms"
+
+
+def _budget(row, column):
+    value = (row or {}).get(column)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        print(f"[WARN] invalid {column} {value!r} for case {(row or {}).get('ID')!r}; ignored")
+        return None
+    return value if value > 0 else None
+
+
+def _endpoint(metrics):
+    return f"{(metrics.get('method') or '').upper()} {urlparse(metrics.get('url') or '').path}"
+
+
+def _stats(values):
+    values = sorted(values)
+    return {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95)}
+
+
+def collect_samples(result, rows, samples=0):
+    """
+    返回 {"cases": {case_id: [ms, ...]}, "endpoints": {endpoint: [ms, ...]},
+          "endpoint_of": {case_id: endpoint}, "rows": {case_id: row}, "resampled": n, "dropped": n}
+    rows: Excel case dict 列表（重发用）；samples: 每个通过的 GET / HEAD / OPTIONS case 额外重发的次数
+    """
+    by_id = {str(r.get("ID")): r for r in rows if r.get("ID")}
+    cases, endpoints, seen, status_of = {}, {}, {}, {}
+    for n, test, _, _ in result.result:
+        metrics = getattr(test, "metrics", None) or {}
+        if n != 0 or metrics.get("total_ms") is None or metrics.get("case_id") is None:
+            continue
+        case_id = str(metrics["case_id"])
+        endpoint = _endpoint(metrics)
+        seen[case_id] = endpoint
+        status_of[case_id] = metrics.get("http_status")
+        cases.setdefault(case_id, []).append(metrics["total_ms"])
+        endpoints.setdefault(endpoint, []).append(metrics["total_ms"])
+    resend = [case_id for case_id in seen if is_safe(by_id.get(case_id, {}).get("method"))]
+
+    dropped = 0
+    if samples > 0 and resend:
+        # 顺序重发（不并发），避免压测自己把延迟推高
+        sender = SendRequests(retries=0)
+        session = get_transport().session
+        try:
+            for case_id in resend:
+                row, endpoint = by_id[case_id], seen[case_id]
+                for _ in range(samples):
+                    resp = sender.sendRequests(session, row)
+                    metrics = getattr(resp, "metrics", None)
+                    if metrics is None or metrics.get("total_ms") is None:
+                        continue
+                    if metrics.get("http_status") != status_of[case_id]:
+                        dropped += 1
+                        continue
+                    cases[case_id].append(metrics["total_ms"])
+                    endpoints[endpoint].append(metrics["total_ms"])
+        finally:
+            close_transport()
+
+    return {"cases": cases, "endpoints": endpoints, "endpoint_of": seen, "rows": {k: by_id.get(k) for k in seen},
+            "resampled": len(resend) if samples > 0 else 0, "dropped": dropped}
+
+
+def summarize(collected):
+    return {
+        "cases": {k: _stats(v) for k, v in sorted(collected["cases"].items())},
+        "endpoints": {k: _stats(v) for k, v in sorted(collected["endpoints"].items())},
+    }
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+    except FileNotFoundError:
+        return None
+    if payload.get("version") != BASELINE_VERSION:
+        print(f"[WARN] perf baseline version mismatch, ignoring (path={path})")
+        return None
+    return payload
+
+
+def save_baseline(summary, path, samples):
+    payload = {"version": BASELINE_VERSION, "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+               "samples": samples}
+    payload.update(summary)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def _over_baseline(current, base, ratio):
+    if current is None or not base:
+        return False
+    return current > base * ratio and current - base > setting.PERF_MIN_DELTA_MS
+
+
+def check(collected, summary, baseline=None):
+    """返回回归列表：每项 {kind, name, metric, limit, current, samples, reason}"""
+    regressions = []
+
+    def add(kind, name, metric, limit, stats, reason):
+        regressions.append({"kind": kind, "name": name, "metric": metric, "limit": limit,
+                            "current": stats[metric], "samples": stats["count"], "reason": reason})
+
+    # 1) Excel 里声明的预算（p95）
+    endpoint_budgets = {}
+    for case_id, row in collected["rows"].items():
+        stats = summary["cases"][case_id]
+        budget = _budget(row, CASE_BUDGET_COLUMN)
+        if budget is not None and stats["p95"] > budget:
+            add("case", case_id, "p95", budget, stats, "budget")
+        budget = _budget(row, ENDPOINT_BUDGET_COLUMN)
+        if budget is not None:
+            endpoint = collected["endpoint_of"][case_id]
+            endpoint_budgets[endpoint] = min(budget, endpoint_budgets.get(endpoint, budget))
+    for endpoint, budget in sorted(endpoint_budgets.items()):
+        stats = summary["endpoints"][endpoint]
+        if stats["p95"] > budget:
+            add("endpoint", endpoint, "p95", budget, stats, "budget")
+
+    # 2) 与基线对比
+    if baseline:
+        for kind, group in (("case", "cases"), ("endpoint", "endpoints")):
+            base_group = baseline.get(group, {})
+            for name, stats in summary[group].items():
+                base = base_group.get(name)
+                if not base:
+                    continue
+                for metric, ratio in (("p50", setting.PERF_P50_RATIO), ("p95", setting.PERF_P95_RATIO)):
+                    if _over_baseline(stats[metric], base.get(metric), ratio):
+                        add(kind, name, metric, base[metric], stats, f"baseline x{ratio:g}")
+    return regressions
+
+
+def print_regressions(regressions):
+    print("----- PERF REGRESSIONS -----")
+    header = f"{'kind':<9} {'name':<40} {'metric':>6} {'limit(ms)':>10} {'current(ms)':>12} {'x':>6} {'n':>4}  reason"
+    print(header)
+    for r in regressions:
+        ratio = r["current"] / r["limit"] if r["limit"] else 0
+        print(f"{r['kind']:<9} {str(r['name'])[:40]:<40} {r['metric']:>6} {r['limit']:>10.2f} "
+              f"{r['current']:>12.2f} {ratio:>6.2f} {r['samples']:>4}  {r['reason']}")
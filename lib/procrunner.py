@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+import os
+import sys
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from package.HTMLTestRunner import HTMLTestRunner, _TestResult, _iter_tests
+from lib import resilience
+from lib.cassette import get_cassette
+from lib.datadriven import iter_entries, subset
+from lib.transport import close_transport
+from lib.writeexcel import ResultCollector, get_result_sink, set_result_sink
+
+
+def partition(test_ids, processes, chains=None):
+    """round-robin 切片：返回 [(ordinals, test_ids), ...]，相邻 case 分到不同进程
+
+    chains: {test id: chain key}，同一条链的 case 跟着链上第一个 case 分到同一个进程
+    """
+    chains = chains or {}
+    buckets = [[] for _ in range(processes)]
+    chain_slot = {}
+    for k, test_id in enumerate(test_ids):
+        key = chains.get(test_id)
+        slot = k % processes if key is None else chain_slot.setdefault(key, k % processes)
+        buckets[slot].append(k)
+    return [(ordinals, [test_ids[k] for k in ordinals]) for ordinals in buckets if ordinals]
+
+
+def _run_slice(test_path, pattern, ordinals, test_ids, verbosity, workers, capture_limit=0, spill_dir=None,
+               chains=None):
+    """子进程：只跑分到的 case，结果压缩后交回父进程（不写 HTML/Excel）"""
+    collector = ResultCollector()
+    set_result_sink(collector)
+
+    # 按 test id 从重新 discover 的 suite 里挑出本进程的 case（父进程可能只选了一部分）
+    ordinal_of = dict(zip(test_ids, ordinals))
+    suite = subset(unittest.defaultTestLoader.discover(test_path, pattern=pattern), test_ids)
+    tests = list(_iter_tests(suite))
+    # 单条输出上限 / 溢出文件在子进程里处理；整轮内存预算由父进程合并时控制
+    result = _TestResult(verbosity, capture_limit=capture_limit, spill_dir=spill_dir)
+    result.set_order(tests, [ordinal_of[t.id()] for t in tests])
+    HTMLTestRunner(verbosity=verbosity, workers=workers, chains=chains).execute(unittest.TestSuite(tests), result)
+
+    set_result_sink(None)
+    transport_stats = close_transport()
+    # 录制：录到的请求 / 响应交给父进程统一写 cassette；回放：回放计数与 miss
+    cassette = get_cassette()
+    return {
+        "result": result.export(),
+        "excel": collector.rows,
+        "transport": transport_stats,
+        "cassette": cassette.export() if cassette is not None else None,
+        "resilience": resilience.export_stats(),
+    }
+
+
+def run_in_processes(runner, suite, test_path, processes, pattern="*API.py"):
+    """把 suite 按 case 分给 N 个进程执行，父进程合并成一个 result 并生成一份 HTML 报告
+
+    Excel 结果由父进程的共享 sink 统一写入，子进程不碰 setting.TARGET_FILE。
+    """
+    test_ids = [test_id for test_id, _ in iter_entries(suite)]
+    result = runner.make_result()
+    sink = get_result_sink()
+    transport_stats = {"requests": 0, "connections": 0, "reused": 0}
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [
+            pool.submit(_run_slice, test_path, pattern, ordinals, ids, runner.verbosity, runner.workers,
+                        runner.capture_limit, runner.spill_dir,
+                        {t: runner.chains[t] for t in ids if t in runner.chains})
+            for ordinals, ids in partition(test_ids, processes, runner.chains)
+        ]
+        exported = []
+        for future in futures:
+            payload = future.result()
+            exported.append(payload["result"])
+
+            collector = ResultCollector()
+            collector.rows = payload["excel"]
+            collector.replay(sink)
+
+            if payload["cassette"]:
+                get_cassette().merge(payload["cassette"])
+            resilience.merge_stats(payload["resilience"])
+
+            for k, v in (payload["transport"] or {}).items():
+                transport_stats[k] += v
+
+    # 各进程的结果按 discovery 序号合并成一份再交给 result，--stream-report 的行顺序与串行运行一致
+    result.merge({
+        "testsRun": sum(e["testsRun"] for e in exported),
+        "records": sorted((r for e in exported for r in e["records"]), key=lambda r: r[0]),
+        "skipped": sorted((r for e in exported for r in e["skipped"]), key=lambda r: r[0]),
+    })
+    result.sort_results()
+    result.transport_stats = transport_stats
+    return runner.finish(suite, result)
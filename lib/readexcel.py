@@ -2,31 +2,79 @@
 # _*_ coding:utf-8 _*_
 __author__ = 'Qun Li'
 
+import sys
 from openpyxl import load_workbook
 
 
 class ReadExcel():
-    """读取excel文件数据"""
-    def __init__(self, fileName, SheetName="Sheet1"):
-        self.workbook = load_workbook(fileName)
+    """读取excel文件数据
+
+    read_only=True 时使用 openpyxl 的只读 workbook 流式读取，
+    iter_data() 按需逐行产出 case dict，适合几万行的大表。
+    """
+    def __init__(self, fileName, SheetName="Sheet1", read_only=False):
+        self.read_only = read_only
+        self.workbook = load_workbook(fileName, read_only=read_only)
         self.sheet = self.workbook[SheetName]
 
-        # 获取总行数、总列数
+        # 获取总行数、总列数（只读模式下可能为 None，需要逐行扫描才能知道）
         self.nrows = self.sheet.max_row
         self.ncols = self.sheet.max_column
+        self._keys = None
 
-    def read_data(self):
-        if self.nrows > 1:
-            # 第一行作为 key
-            keys = [cell.value for cell in self.sheet[1]]
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # 只读模式会一直持有文件句柄，用完要关
+        if self.read_only:
+            self.workbook.close()
+
+    def keys(self):
+        """第一行作为 key（只解析一次，字符串做 intern，所有行共享同一个 tuple）"""
+        if self._keys is None:
+            header = next(self.sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+            self._keys = tuple(sys.intern(k) if isinstance(k, str) else k for k in header)
+        return self._keys
+
+    def iter_data(self, min_row=2, max_row=None, ids=None, skip_blank=False):
+        """逐行产出 case dict（generator）
+
+        min_row/max_row: Excel 行号范围（含两端，数据从第 2 行开始）
+        ids: 只产出这些 ID 的行；全部找到后立即停止读取
+        skip_blank: 跳过整行为空的行
+        """
+        keys = self.keys()
+        if not keys:
+            return
 
-            listApiData = []
+        id_idx = keys.index("ID") if ids is not None and "ID" in keys else None
+        wanted = set(ids) if ids is not None else None
+        if wanted is not None and id_idx is None:
+            return
+
+        for row in self.sheet.iter_rows(min_row=max(min_row, 2), max_row=max_row, values_only=True):
+            if wanted is not None:
+                if id_idx >= len(row) or row[id_idx] not in wanted:
+                    continue
+                wanted.discard(row[id_idx])
+            elif skip_blank and all(v is None for v in row):
+                continue
+
+            yield dict(zip(keys, row))
+
+            if wanted is not None and not wanted:
+                break
+
+    def read_data(self):
+        if self.nrows is None or self.nrows > 1:
             # 从第二行开始读
-            for row in self.sheet.iter_rows(min_row=2, values_only=True):
-                api_dict = dict(zip(keys, row))
-                listApiData.append(api_dict)
-
-            return listApiData
-        else:
-            print("表格是空数据!")
-            return None
+            listApiData = list(self.iter_data())
+            if listApiData:
+                return listApiData
+
+        print("表格是空数据!")
+        return None
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+"""
+SendRequests 的超时 / 重试 / 熔断。
+
+    超时    (connect, read) 秒：setting.HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT，Excel 可选列 timeout 按行覆盖
+            （"10" = read 超时；"3,10" = connect,read）
+    重试    只对幂等方法（GET / HEAD / OPTIONS / PUT / DELETE），连接错误 / 超时 / HTTP_RETRY_STATUS 时重试
+            HTTP_RETRIES 次，间隔为指数退避 + full jitter：uniform(0, min(BACKOFF_MAX, BACKOFF * 2^n))
+    熔断    每个 host 一个：连续 CIRCUIT_FAILURES 次失败（连接错误 / 超时 / 5xx）后打开，
+            之后的请求直接失败；CIRCUIT_RESET_SECONDS 后放一个试探请求，成功则恢复
+"""
+
+import time
+import random
+import threading
+
+from config import setting
+
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"))
+# 不改变服务端状态的方法：可以随意重发采样（lib/perfgate.py）
+SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "TRACE"))
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def parse_timeout(value):
+    """Excel timeout 单元格 -> (connect, read) / None"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, (int, float)):
+        return (setting.HTTP_CONNECT_TIMEOUT, float(value))
+    try:
+        parts = [float(x) for x in str(value).replace(";", ",").split(",") if x.strip()]
+    except ValueError:
+        parts = []
+    if any(x <= 0 for x in parts):
+        parts = []
+    if len(parts) == 1:
+        return (setting.HTTP_CONNECT_TIMEOUT, parts[0])
+    if len(parts) == 2:
+        return (parts[0], parts[1])
+    raise ValueError(f"invalid timeout {value!r} (expected read or connect,read seconds)")
+
+
+def default_timeout():
+    return (setting.HTTP_CONNECT_TIMEOUT, setting.HTTP_READ_TIMEOUT)
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """第 attempt 次重试（从 0 开始）前的等待秒数"""
+    base = setting.HTTP_RETRY_BACKOFF if base is None else base
+    cap = setting.HTTP_RETRY_BACKOFF_MAX if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_safe(method):
+    return (method or "").upper() in SAFE_METHODS
+
+
+def is_retryable(method, status=None):
+    if method.upper() not in IDEMPOTENT_METHODS:
+        return False
+    return status is None or status in setting.HTTP_RETRY_STATUS
+
+
+class CircuitBreaker:
+    """closed -> (连续失败) open -> (冷却) half-open -> 试探成功 closed / 失败 open"""
+
+    def __init__(self, host, failures=None, reset_seconds=None):
+        self.host = host
+        self.threshold = setting.CIRCUIT_FAILURES if failures is None else failures
+        self.reset_seconds = setting.CIRCUIT_RESET_SECONDS if reset_seconds is None else reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """熔断打开时直接抛 CircuitOpenError"""
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half-open"
+            if self.state == "half-open" and not self._probing:
+                self._probing = True
+                return
+        _stats.add("fast_failed")
+        raise CircuitOpenError(
+            f"circuit open for {self.host}: {self.failures} consecutive failures, "
+            f"retry after {self.reset_seconds:g}s"
+        )
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def release(self):
+        """请求因与 host 无关的原因失败（参数错误等）：不计数，只放开试探名额"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or (self.threshold > 0 and self.failures >= self.threshold):
+                if self.state != "open":
+                    _stats.add("opened")
+                    print(f"[WARN] circuit opened for {self.host} after {self.failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class _Stats:
+    KEYS = ("retries", "fast_failed", "opened")
+
+    def __init__(self):
+        self.counts = dict.fromkeys(self.KEYS, 0)
+        self._lock = threading.Lock()
+
+    def add(self, key, n=1):
+        with self._lock:
+            self.counts[key] += n
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            counts = dict(self.counts)
+            if reset:
+                self.counts = dict.fromkeys(self.KEYS, 0)
+            return counts
+
+
+_stats = _Stats()
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(host):
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def count_retry():
+    _stats.add("retries")
+
+
+def stats():
+    """本进程的重试 / 熔断计数"""
+    return _stats.snapshot()
+
+
+def export_stats():
+    """多进程：子进程把计数交回父进程（取走后清零）"""
+    return _stats.snapshot(reset=True)
+
+
+def merge_stats(counts):
+    """多进程：把子进程的计数加进来"""
+    for key, n in (counts or {}).items():
+        _stats.add(key, n)
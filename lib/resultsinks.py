@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+"""
+增量结果输出（每个 case 结束就写盘），挂在 HTMLTestRunner 的 _TestResult 上：
+
+    NDJSONSink    每行一个 case：ID / 状态 / 耗时 / HTTP 状态码 / 字节数
+    JUnitXMLSink  JUnit XML（Jenkins junit 步骤可直接解析）
+
+sink 接口：write_test(n, test, output, exc) / write_skip(test, reason) / close(result)
+n: 0 = PASS, 1 = FAIL, 2 = ERROR。run 中途被杀时，两种文件里都是已完成的 case。
+"""
+
+import io
+import os
+import re
+import json
+import time
+import socket
+import datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from lib.metrics import STATUS
+
+# XML 1.0 不允许的控制字符
+_INVALID_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _case_id(test):
+    metrics = getattr(test, "metrics", None) or {}
+    case_id = metrics.get("case_id")
+    if case_id is None:
+        case_id = (getattr(test, "data_row", None) or {}).get("ID")
+    return case_id
+
+
+def _duration(test):
+    d = getattr(test, "duration", None)
+    return round(d, 6) if d is not None else None
+
+
+def _message(exc):
+    """traceback 的最后一行（异常类型 + 消息）"""
+    lines = [line for line in (exc or "").strip().splitlines() if line.strip()]
+    return lines[-1].strip() if lines else ""
+
+
+def _split_id(test_id):
+    classname, _, name = test_id.rpartition(".")
+    return classname or test_id, name or test_id
+
+
+class NDJSONSink(object):
+    """每个 case 一行 JSON，写完立即 flush"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._fp = io.open(path, "w", encoding="utf-8")
+
+    def _write(self, record):
+        self._fp.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._fp.flush()
+
+    def write_test(self, n, test, output, exc):
+        metrics = getattr(test, "metrics", None) or {}
+        duration = _duration(test)
+        self._write({
+            "ts": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "test": test.id(),
+            "case_id": _case_id(test),
+            "status": STATUS.get(n, str(n)),
+            "duration_ms": round(duration * 1000, 3) if duration is not None else None,
+            "http_status": metrics.get("http_status"),
+            "total_ms": metrics.get("total_ms"),
+            "ttfb_ms": metrics.get("ttfb_ms"),
+            "connect_ms": metrics.get("connect_ms"),
+            "request_bytes": metrics.get("request_bytes"),
+            "response_bytes": metrics.get("response_bytes"),
+            "message": _message(exc) if n else None,
+        })
+
+    def write_skip(self, test, reason):
+        self._write({
+            "ts": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "test": test.id(),
+            "case_id": _case_id(test),
+            "status": "SKIP",
+            "message": reason,
+        })
+
+    def close(self, result=None):
+        if not self._fp.closed:
+            self._fp.close()
+
+
+class JUnitXMLSink(object):
+    """
+    JUnit XML，文件在任何时刻都是完整合法的 XML：
+    每写一个 testcase 就补上结尾标签，下一个 testcase 从结尾标签处覆盖；
+    <testsuite> 的计数属性是定长（补零）的，原地更新。
+    """
+
+    COUNTERS = ("tests", "failures", "errors", "skipped")
+    TAIL = "</testsuite>\n</testsuites>\n"
+
+    def __init__(self, path, suite_name="run_demo"):
+        self.path = path
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self.time = 0.0
+        self._started = time.perf_counter()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._fp = io.open(path, "w+b")
+
+        head = '<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n<testsuite name=%s hostname=%s timestamp="%s" ' % (
+            quoteattr(suite_name), quoteattr(socket.gethostname()),
+            datetime.datetime.now().isoformat(timespec="seconds"),
+        )
+        self._fp.write(head.encode("utf-8"))
+        self._counters_at = self._fp.tell()
+        self._fp.write(self._counters().encode("utf-8"))
+        self._fp.write(b">\n")
+        self._body_end = self._fp.tell()
+        self._fp.write(self.TAIL.encode("utf-8"))
+        self._fp.flush()
+
+    def _counters(self):
+        attrs = " ".join('%s="%010d"' % (k, self.counts[k]) for k in self.COUNTERS)
+        return '%s time="%014.3f"' % (attrs, self.time)
+
+    @staticmethod
+    def _text(s):
+        return escape(_INVALID_XML.sub("", s or ""))
+
+    @staticmethod
+    def _attr(s):
+        return quoteattr(_INVALID_XML.sub("", s or ""))
+
+    def _append(self, xml, counter=None):
+        self.counts["tests"] += 1
+        if counter:
+            self.counts[counter] += 1
+        self.time = time.perf_counter() - self._started
+
+        self._fp.seek(self._body_end)
+        self._fp.write(xml.encode("utf-8"))
+        self._body_end = self._fp.tell()
+        self._fp.write(self.TAIL.encode("utf-8"))
+        self._fp.truncate()
+        self._fp.seek(self._counters_at)
+        self._fp.write(self._counters().encode("utf-8"))
+        self._fp.flush()
+
+    def _testcase(self, test, inner=""):
+        classname, name = _split_id(test.id())
+        duration = _duration(test) or 0.0
+        open_tag = '<testcase classname=%s name=%s time="%.3f"' % (self._attr(classname), self._attr(name), duration)
+        if not inner:
+            return open_tag + "/>\n"
+        return open_tag + ">\n" + inner + "</testcase>\n"
+
+    def write_test(self, n, test, output, exc):
+        if n == 0:
+            self._append(self._testcase(test))
+            return
+        tag, counter = ("failure", "failures") if n == 1 else ("error", "errors")
+        message = _message(exc)
+        inner = "<%s message=%s type=%s>%s</%s>\n" % (
+            tag, self._attr(message), self._attr(message.split(":", 1)[0]), self._text(exc), tag,
+        )
+        if output:
+            inner += "<system-out>%s</system-out>\n" % self._text(output)
+        self._append(self._testcase(test, inner), counter)
+
+    def write_skip(self, test, reason):
+        self._append(self._testcase(test, "<skipped message=%s/>\n" % self._attr(reason)), "skipped")
+
+    def close(self, result=None):
+        if not self._fp.closed:
+            self._fp.close()
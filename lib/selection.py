@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+"""
+按上一次运行的结果挑选要跑的 case（开发时快速回归，nightly 仍跑全量）。
+
+    --rerun-failed : 上次 FAIL / ERROR 的 case
+    --changed-only : 请求 / 期望 / 运行参数单元格的 hash 与上次运行记录不同（或从没跑过）的 case
+    smoke IDs      : 以上两种模式下总会跑的 case
+
+运行状态存在 JSON 文件里（默认 report/last_run.json），key 是 Excel 的 ID 列（没有 ID 时用 test id），
+每次运行后只更新本次跑到的 case，所以子集运行不会冲掉其它 case 的历史。
+"""
+
+import os
+import json
+import time
+import hashlib
+
+from lib.chaining import upstream
+from lib.datadriven import iter_entries, subset
+from lib.metrics import STATUS
+
+STATE_VERSION = 2
+
+# 参与 hash 的列：请求本身 + 期望结果 + 影响 case 怎么跑的可选列
+# （extract: lib/chaining.py；timeout: lib/resilience.py；budget_ms / endpoint_budget_ms: lib/perfgate.py；
+#   weight: lib/loadgen.py）。新增这类列时要加到这里并把 STATE_VERSION +1
+REQUEST_FIELDS = ("url", "method", "params", "headers", "body", "type")
+EXPECT_FIELDS = ("status_code", "msg")
+RUN_FIELDS = ("extract", "timeout", "budget_ms", "endpoint_budget_ms", "weight")
+
+FAILED_OUTCOMES = ("FAIL", "ERROR")
+
+
+def case_key(test_id, row):
+    case_id = (row or {}).get("ID")
+    if case_id is None or str(case_id).strip() == "":
+        return test_id
+    return str(case_id).strip()
+
+
+def row_hash(row):
+    if row is None:
+        return None
+    cells = [row.get(k) for k in REQUEST_FIELDS + EXPECT_FIELDS + RUN_FIELDS]
+    return hashlib.sha1(json.dumps(cells, default=str, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class RunState:
+    """每个 case 最近一次的结果与单元格 hash"""
+
+    def __init__(self, path):
+        self.path = path
+        self.cases = {}
+        self.loaded = False
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    payload = json.load(f)
+                if payload.get("version") == STATE_VERSION:
+                    self.cases = payload.get("cases", {})
+                    self.loaded = True
+            except Exception as e:
+                print(f"[WARN] run state unreadable, ignoring -> {e} (path={path})")
+
+    def failed(self, key):
+        return self.cases.get(key, {}).get("outcome") in FAILED_OUTCOMES
+
+    def changed(self, key, digest):
+        entry = self.cases.get(key)
+        return entry is None or entry.get("hash") != digest
+
+    def update(self, result, index):
+        """index: {test_id: (key, hash)}，由 select_cases 返回"""
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        def record(test, outcome):
+            key, digest = index.get(test.id(), (test.id(), None))
+            self.cases[key] = {"outcome": outcome, "hash": digest, "test": test.id(), "updated_at": now}
+
+        for n, test, _, _ in result.result:
+            record(test, STATUS.get(n, str(n)))
+        for test, _ in result.skipped:
+            record(test, "SKIP")
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": STATE_VERSION, "cases": self.cases}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+
+def select_cases(suite, state, rerun_failed=False, changed_only=False, smoke_ids=(), deps=None):
+    """
+    返回 (suite, index, selected, total)：
+    - suite: 没有开启任何筛选时原样返回，否则是只含选中 case 的 suite（顺序、命名不变）；
+      deps（chaining.build_graph）给出时，选中 case 依赖的上游 case 也一起跑
+    - index: {test_id: (key, hash)}，运行结束后 RunState.update 用
+    """
+    smoke_ids = {str(x).strip() for x in smoke_ids if str(x).strip()}
+    filtering = rerun_failed or changed_only
+    index = {}
+    selected = []
+    for test_id, row in iter_entries(suite):
+        key, digest = case_key(test_id, row), row_hash(row)
+        index[test_id] = (key, digest)
+        if not filtering:
+            continue
+        if (
+            key in smoke_ids
+            or (rerun_failed and state.failed(key))
+            or (changed_only and state.changed(key, digest))
+        ):
+            selected.append(test_id)
+
+    if not filtering:
+        return suite, index, len(index), len(index)
+    if deps:
+        selected = upstream(selected, deps)
+    return subset(suite, selected), index, len(selected), len(index)
@@ -4,13 +4,22 @@ __author__ = 'Qun Li'
 
 import os
 import sys
-import json
+import time
 import traceback
 import ast
 from urllib.parse import urlparse, urlunparse, parse_qsl
 
+import requests
+
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+from config import setting
+from lib import jsoncodec
+from lib import resilience
+from lib.cassette import CassetteMiss
+from lib.chaining import parse_extract, resolve_spec, spec_references
+from lib.transport import InstrumentedAdapter, get_transport, request_metrics, start_request_timing
+
 
 def _is_blank(x):
     return x is None or (isinstance(x, str) and x.strip() == "")
@@ -30,7 +39,7 @@ def safe_parse(x):
 
         # 1) JSON
         try:
-            return json.loads(s)
+            return jsoncodec.loads(s)
         except Exception:
             pass
 
@@ -80,13 +89,131 @@ def _rewrite_url_for_docker(url: str) -> str:
     return url
 
 
+# 预解析好的请求参数在 case dict 里的 key（见 lib/casecache.py）
+CASE_SPEC_KEY = "__spec__"
+
+
+def build_request_spec(apiData):
+    """把一行 Excel 数据解析成请求参数（与运行环境无关，可缓存）"""
+    params = safe_parse(apiData.get("params"))
+    headers = safe_parse(apiData.get("headers"))
+
+    if params is not None and not isinstance(params, dict):
+        print(f"[WARN] params is not dict after parse: {params!r}. Forcing to None.")
+        params = None
+    if headers is not None and not isinstance(headers, dict):
+        print(f"[WARN] headers is not dict after parse: {headers!r}. Forcing to None.")
+        headers = None
+
+    # 可选列写错时只记下错误，由该 case 自己失败（不影响整张 sheet 的加载）
+    errors = []
+    try:
+        extract = parse_extract(apiData.get("extract"))
+    except ValueError as e:
+        errors.append(f"extract: {e}")
+        extract = {}
+    try:
+        timeout = resilience.parse_timeout(apiData.get("timeout"))
+    except ValueError as e:
+        errors.append(f"timeout: {e}")
+        timeout = None
+
+    spec = {
+        "method": (apiData.get("method") or "").strip(),
+        "url": (apiData.get("url") or "").strip(),
+        "params": params,
+        "headers": headers,
+        "body": safe_parse(apiData.get("body")),
+        "type": (apiData.get("type") or "").strip().lower(),
+        # 链式 case：要从响应里提取的变量 {var: JSON path}，以及请求里引用到的 ${var}
+        "extract": extract,
+        # 可选列 timeout：本行的 (connect, read) 秒，None = 全局默认
+        "timeout": timeout,
+        "errors": errors,
+    }
+    spec["refs"] = sorted(spec_references(spec))
+    return spec
+
+
+def case_spec(apiData):
+    """预解析结果（case cache）优先，否则现场解析"""
+    return apiData.get(CASE_SPEC_KEY) or build_request_spec(apiData)
+
+
 class SendRequests:
     """发送请求数据"""
 
+    def __init__(self, retries=None):
+        # None = setting.HTTP_RETRIES；压测 / 性能采样传 0，只测单次请求
+        self.retries = setting.HTTP_RETRIES if retries is None else retries
+
+    def _send(self, s, method, url, kwargs):
+        """
+        带超时 / 重试 / 熔断发送，返回 (resp, 尝试次数, 最后一次的 t0, instrumented)。
+        幂等方法在连接错误 / 超时 / HTTP_RETRY_STATUS 时退避重试。
+        回放 cassette（offline adapter）不联网：不重试、不退避、不计熔断；CassetteMiss 在任何模式下都不重试也不计熔断。
+        """
+        adapter = s.get_adapter(url)
+        instrumented = isinstance(adapter, InstrumentedAdapter)
+        offline = getattr(adapter, "offline", False)
+        breaker = None if offline else resilience.get_breaker(urlparse(url).netloc)
+        retries = 0 if offline else self.retries
+        retryable = resilience.is_retryable(method)
+        attempt = 0
+        while True:
+            if breaker is not None:
+                breaker.before_request()
+            start_request_timing()
+            t0 = time.perf_counter()
+            try:
+                resp = s.request(method=method, url=url, **kwargs)
+            except CassetteMiss:
+                # 请求不在 cassette 里：与 host 是否健康无关，重发也不会命中
+                if breaker is not None:
+                    breaker.release()
+                raise
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if breaker is not None:
+                    breaker.record_failure()
+                if not retryable or attempt >= retries:
+                    raise
+                reason = f"{type(e).__name__}: {e}"
+            except Exception:
+                if breaker is not None:
+                    breaker.release()
+                raise
+            else:
+                if breaker is not None:
+                    if resp.status_code >= 500:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                if attempt >= retries or not resilience.is_retryable(method, resp.status_code):
+                    return resp, attempt + 1, t0, instrumented
+                reason = f"HTTP {resp.status_code}"
+                resp.close()
+
+            delay = resilience.backoff_delay(attempt)
+            attempt += 1
+            resilience.count_retry()
+            print(f"[RETRY] {method.upper()} {url}: {reason}; attempt {attempt + 1}/{retries + 1} "
+                  f"in {delay:.2f}s")
+            time.sleep(delay)
+
     def sendRequests(self, s, apiData):
         try:
-            method = (apiData.get("method") or "").strip()
-            url = (apiData.get("url") or "").strip()
+            # 默认走 suite 级共享连接池（keep-alive 复用）
+            if s is None:
+                s = get_transport().session
+
+            # 命中 case cache 时直接用预解析结果，跳过 safe_parse
+            spec = case_spec(apiData)
+            if spec.get("errors"):
+                raise ValueError(f"invalid Excel row: {'; '.join(spec['errors'])}")
+            # ${var} -> 前面 case 提取到的值
+            spec = resolve_spec(spec)
+            method = spec["method"]
+            url = spec["url"]
 
             if not method or not url:
                 raise ValueError(f"Excel row missing method/url: method={method!r}, url={url!r}")
@@ -94,39 +221,34 @@ class SendRequests:
             # ✅ Docker 下自动改写 localhost/127.0.0.1 -> target-api
             url = _rewrite_url_for_docker(url)
 
-            params = safe_parse(apiData.get("params"))
-            headers = safe_parse(apiData.get("headers"))
-            body_data = safe_parse(apiData.get("body"))
-            req_type = (apiData.get("type") or "").strip().lower()
-
-            if params is not None and not isinstance(params, dict):
-                print(f"[WARN] params is not dict after parse: {params!r}. Forcing to None.")
-                params = None
-            if headers is not None and not isinstance(headers, dict):
-                print(f"[WARN] headers is not dict after parse: {headers!r}. Forcing to None.")
-                headers = None
-
-            if req_type == "json":
-                resp = s.request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    params=params,
-                    json=body_data,
-                    verify=False,
-                )
-            else:
-                resp = s.request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    params=params,
-                    data=body_data,
-                    verify=False,
-                )
-
+            headers = spec["headers"]
+            body_data = spec["body"]
+
+            if spec["type"] == "json" and body_data is not None:
+                # body 用统一 codec 编码（与 requests 的 json= 一样：None 不发 body）
+                headers = dict(headers or {})
+                if not any(k.lower() == "content-type" for k in headers):
+                    headers["Content-Type"] = "application/json"
+                body_data = jsoncodec.dumps(body_data)
+
+            resp, attempts, t0, instrumented = self._send(s, method, url, {
+                "headers": headers,
+                "params": spec["params"],
+                "data": body_data,
+                "verify": False,
+                "timeout": spec.get("timeout") or resilience.default_timeout(),
+            })
+
+            # 耗时/字节数明细挂在 response 上（connect / ttfb / total / bytes / reused；重试时为最后一次）
+            metrics = {"case_id": apiData.get("ID"), "method": method.upper(), "url": url, "attempts": attempts}
+            metrics.update(request_metrics(resp, time.perf_counter() - t0, instrumented))
+            resp.metrics = metrics
             return resp
 
+        except resilience.CircuitOpenError as e:
+            # 熔断：不打 traceback，剩下的 case 快速失败
+            print("SendRequests fast-failed:", e)
+            return None
         except Exception as e:
             print("SendRequests Exception:", e)
             traceback.print_exc()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+"""
+按 case 切分到多个 Jenkins agent（run_demo.py --shard i/n），各 shard 的结果用 lib/shardmerge.py 合并。
+
+分配只取决于 case 的 ID（没有 ID 时用 test id），与机器 / 执行顺序无关：
+    默认            hash(ID) % n
+    --shard-balance 按历史耗时（history 库）做贪心均衡：耗时长的先分，每次分给当前总耗时最小的 shard
+链式 case（lib/chaining.py）整条链作为一个单元分到同一个 shard。
+
+所有 shard 必须看到同一份输入（Excel / history 库）才能得到同一个分配；
+SHARD_PLAN 是整个分配的指纹，合并时会检查各 shard 是否一致。
+"""
+
+import json
+import time
+import hashlib
+import statistics
+
+from lib.selection import case_key
+
+PAYLOAD_VERSION = 1
+
+
+def parse_shard(text):
+    """'2/4' -> (2, 4)，编号从 1 开始"""
+    try:
+        index, count = (int(x) for x in str(text).split("/"))
+    except ValueError:
+        raise ValueError(f"invalid shard {text!r} (expected i/n, e.g. 2/4)") from None
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"invalid shard {text!r}: need 1 <= i <= n")
+    return index, count
+
+
+def stable_hash(key):
+    return int.from_bytes(hashlib.sha1(str(key).encode("utf-8")).digest()[:8], "big")
+
+
+def _units(entries, chains):
+    """[(unit key, [test_id, ...], [case key, ...]), ...]：链是一个单元，其余每个 case 一个单元"""
+    units, by_chain = [], {}
+    for test_id, row in entries:
+        key = case_key(test_id, row)
+        chain = (chains or {}).get(test_id)
+        if chain is None:
+            units.append((key, [test_id], [key]))
+        elif chain in by_chain:
+            by_chain[chain][1].append(test_id)
+            by_chain[chain][2].append(key)
+        else:
+            by_chain[chain] = (key, [test_id], [key])
+            units.append(by_chain[chain])
+    return units
+
+
+def assign(entries, count, chains=None, durations=None):
+    """返回 {test_id: shard 编号（1..count）}；durations: {case key: 秒}，给出时按耗时均衡"""
+    units = _units(entries, chains)
+    plan = {}
+    if not durations:
+        for key, test_ids, _ in units:
+            shard = stable_hash(key) % count + 1
+            for test_id in test_ids:
+                plan[test_id] = shard
+        return plan
+
+    # 没有历史耗时的 case 按已知耗时的中位数估计
+    default = statistics.median(durations.values())
+    weighted = [(sum(durations.get(k, default) for k in keys), key, test_ids) for key, test_ids, keys in units]
+    weighted.sort(key=lambda u: (-u[0], stable_hash(u[1])))
+    loads = [0.0] * count
+    for weight, _, test_ids in weighted:
+        shard = min(range(count), key=lambda i: (loads[i], i))
+        loads[shard] += weight
+        for test_id in test_ids:
+            plan[test_id] = shard + 1
+    return plan
+
+
+def plan_fingerprint(plan):
+    h = hashlib.sha1()
+    for test_id in sorted(plan):
+        h.update(f"{test_id}={plan[test_id]}\n".encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
+def write_payload(path, result, shard, plan, ordinals, excel_rows, summary):
+    """
+    shard 的机器可读结果（lib/shardmerge.py 读取）：
+    result 用 _TestResult.export()，序号换成完整 suite 里的位置，合并后顺序与不分片时一致
+    """
+    exported = result.export()
+    fix = lambda item: (ordinals.get(item[1], len(ordinals)),) + tuple(item[1:])
+    exported["records"] = [fix(r) for r in exported["records"]]
+    exported["skipped"] = [fix(r) for r in exported["skipped"]]
+    payload = {
+        "version": PAYLOAD_VERSION,
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "shard": list(shard),
+        "plan": plan_fingerprint(plan),
+        "summary": summary,
+        "result": exported,
+        "excel": [[row_num, value, extra] for row_num, (value, extra) in sorted(excel_rows.items())],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, default=str)
+    return path
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+"""
+合并 run_demo.py --shard i/n 的结果：一份 HTML 报告、一份 Excel 结果、汇总计数和一个退出码。
+
+    python lib/shardmerge.py report/shard-1 report/shard-2 report/shard-3 --report-dir report/merged
+
+参数可以是 shard 的 report 目录（取其中最新的 *_shard.json）或 payload 文件本身。
+退出码：2 = 缺 shard / 分配不一致 / 某个 shard 自身出错；1 = 有失败；3 = 只有性能回归；0 = 全部通过
+"""
+
+import os
+import sys
+import glob
+import json
+import shutil
+import argparse
+import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import setting
+from package.HTMLTestRunner import HTMLTestRunner
+from lib.sharding import PAYLOAD_VERSION
+from lib.writeexcel import WriteExcel
+
+
+RESULTS = {0: "SUCCESS", 1: "FAILED", 2: "INCOMPLETE", 3: "PERF_REGRESSION"}
+
+
+def find_payloads(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = sorted(glob.glob(os.path.join(path, "*_shard.json")))
+            if not found:
+                print(f"[WARN] no shard payload in {path}")
+            files.extend(found[-1:])
+        else:
+            files.append(path)
+    return files
+
+
+def load_payloads(files):
+    """返回 {shard 编号: payload}（同一个 shard 多份时取最新）和 shard 总数"""
+    payloads, counts = {}, set()
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version") != PAYLOAD_VERSION:
+            raise ValueError(f"unsupported shard payload version in {path}")
+        index, count = payload["shard"]
+        counts.add(count)
+        payload["path"] = path
+        old = payloads.get(index)
+        if old is None or payload["generated_at"] >= old["generated_at"]:
+            payloads[index] = payload
+    if len(counts) > 1:
+        raise ValueError(f"payloads come from different shard counts: {sorted(counts)}")
+    return payloads, (counts.pop() if counts else 0)
+
+
+def merge_excel(payloads, target_file):
+    """从模板拷一份，按行写入各 shard 的结果"""
+    if os.path.exists(target_file):
+        os.remove(target_file)
+    sink = WriteExcel(target_file, buffered=True)
+    for payload in payloads:
+        for row_num, value, extra in payload["excel"]:
+            sink.write_data(row_num, value, **extra)
+    sink.close()
+    return target_file
+
+
+def exit_code(payloads, complete, failures, errors):
+    if not complete or any(p["summary"]["exit_code"] == 2 for p in payloads):
+        return 2
+    if failures or errors:
+        return 1
+    if any(p["summary"]["exit_code"] == 3 for p in payloads):
+        return 3
+    return 0
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Merge run_demo.py --shard results into one report")
+    p.add_argument("paths", nargs="+", help="shard report directories or *_shard.json files")
+    p.add_argument("--report-dir", default=os.path.join(setting.TEST_REPORT, "merged"))
+    p.add_argument("--title", default="E-commerce API Automation Test Report")
+    p.add_argument("--tester", default="Qun Li")
+    args = p.parse_args(argv)
+
+    try:
+        payloads, count = load_payloads(find_payloads(args.paths))
+    except Exception as e:
+        print(f"[ERROR] Failed to read shard payloads: {e}")
+        return 2
+    if not payloads:
+        print("[ERROR] no shard payloads found")
+        return 2
+
+    complete = True
+    missing = sorted(set(range(1, count + 1)) - set(payloads))
+    if missing:
+        print(f"[ERROR] missing shards: {', '.join(f'{i}/{count}' for i in missing)}")
+        complete = False
+    plans = {payload["plan"] for payload in payloads.values()}
+    if len(plans) > 1:
+        # 各 shard 的输入（Excel / history 库）不一致：有的 case 可能没跑或跑了两次
+        print(f"[ERROR] shards used different assignments: {sorted(plans)}")
+        complete = False
+
+    ordered = [payloads[i] for i in sorted(payloads)]
+    os.makedirs(args.report_dir, exist_ok=True)
+    now = datetime.datetime.now().strftime("%Y-%m-%d_%H_%M_%S")
+    report_path = os.path.join(args.report_dir, f"{now}_result.html")
+
+    with open(report_path, "wb") as fp:
+        runner = HTMLTestRunner(stream=fp, title=args.title, tester=args.tester,
+                                description=f"Merged from {len(ordered)} of {count} shards")
+        # 报告里的开始时间 / 总耗时按最早开始的 shard 算
+        runner.startTime = min(datetime.datetime.fromisoformat(p["summary"]["started_at"]) for p in ordered)
+        result = runner.make_result()
+        for payload in ordered:
+            result.merge(payload["result"])
+        result.sort_results()
+        runner.finish(None, result)
+    shutil.copyfile(report_path, os.path.join(args.report_dir, "latest.html"))
+
+    excel_path = None
+    try:
+        excel_path = merge_excel(ordered, os.path.join(args.report_dir, "excelReport",
+                                                       os.path.basename(setting.TARGET_FILE)))
+    except Exception as e:
+        print(f"[WARN] Failed to merge Excel results: {e}")
+
+    failures, errors = len(result.failures), len(result.errors)
+    print("----- SHARDS -----")
+    for index, payload in sorted(payloads.items()):
+        s = payload["summary"]
+        print(f"SHARD {index}/{count}: tests={s['tests_run']} failures={s['failures']} errors={s['errors']} "
+              f"result={s['result']} ({payload['path']})")
+    print("----- SUMMARY -----")
+    print(f"SHARDS={len(payloads)}/{count}")
+    print(f"TESTS_RUN={result.testsRun}")
+    print(f"FAILURES={failures}")
+    print(f"ERRORS={errors}")
+    print(f"SKIPPED={len(result.skipped)}")
+    print(f"REPORT_PATH={os.path.abspath(report_path)}")
+    if excel_path:
+        print(f"EXCEL_PATH={os.path.abspath(excel_path)}")
+
+    rc = exit_code(ordered, complete, failures, errors)
+    print(f"RESULT={RESULTS[rc]}")
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+import os
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from config import setting
+
+
+# ====== 单次请求的连接计时（按线程记录，请求在调用线程上同步执行）======
+_timing = threading.local()
+
+
+def start_request_timing():
+    _timing.connect_ms = 0.0
+    _timing.new_connection = False
+
+
+def _mark_connect(seconds):
+    _timing.connect_ms = getattr(_timing, "connect_ms", 0.0) + seconds * 1000
+    _timing.new_connection = True
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _mark_connect(time.perf_counter() - t0)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # 包含 TLS 握手
+        t0 = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _mark_connect(time.perf_counter() - t0)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections record connect time and whether a new socket was opened"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+def _headers_size(headers):
+    return sum(len(str(k)) + len(str(v)) + 4 for k, v in headers.items()) + 2
+
+
+def request_metrics(resp, total_seconds, instrumented=True):
+    """单次请求的耗时/字节数明细（ms / bytes；非 InstrumentedAdapter 时 connect/reused 为 None）"""
+    req = resp.request
+    body = req.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    elif not isinstance(body, (bytes, bytearray)):
+        body = b""
+    request_bytes = len(f"{req.method} {req.path_url} HTTP/1.1\r\n") + _headers_size(req.headers) + len(body)
+    response_bytes = len(resp.content or b"") + _headers_size(resp.headers)
+
+    elapsed = getattr(resp, "elapsed", None)
+    return {
+        "http_status": resp.status_code,
+        "connect_ms": round(getattr(_timing, "connect_ms", 0.0), 3) if instrumented else None,
+        "ttfb_ms": round(elapsed.total_seconds() * 1000, 3) if elapsed is not None else None,
+        "total_ms": round(total_seconds * 1000, 3),
+        "request_bytes": request_bytes,
+        "response_bytes": response_bytes,
+        "reused": (not getattr(_timing, "new_connection", False)) if instrumented else None,
+    }
+
+
+class Transport:
+    """整轮运行共享的 HTTP 连接池
+
+    所有 session 挂同一个 HTTPAdapter（即同一个 urllib3 连接池），
+    keep-alive 连接在 case 之间复用；每个 worker 线程有自己的 Session
+    （cookies/headers 互不干扰）。
+    """
+
+    def __init__(self, pool_connections=None, pool_maxsize=None, pool_block=False):
+        self.pool_connections = pool_connections or setting.HTTP_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or setting.HTTP_POOL_MAXSIZE
+        # record / replay 模式下换成 cassette 的 adapter（lib/cassette.py）
+        from lib.cassette import make_adapter
+        self.adapter = make_adapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=pool_block,
+        )
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = requests.Session()
+            if getattr(self.adapter, "offline", False):
+                # 回放不走网络：跳过每个请求都要做的代理 / netrc 环境变量扫描
+                s.trust_env = False
+            # 目标 API 的数据命名空间（见 run_demo.py --namespace）
+            run_id = os.getenv("RUN_ID")
+            if run_id:
+                s.headers[setting.RUN_ID_HEADER] = run_id
+            s.mount("http://", self.adapter)
+            s.mount("https://", self.adapter)
+            self._local.session = s
+            with self._lock:
+                self._sessions.append(s)
+        return s
+
+    def stats(self):
+        """连接复用统计：requests = 发出的请求数，connections = 新建的 TCP/TLS 连接数"""
+        requests_sent = connections = 0
+        if not hasattr(self.adapter, "poolmanager"):
+            # 回放：没有连接
+            return {"requests": getattr(self.adapter.reader, "served", 0), "connections": 0, "reused": 0}
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue
+            requests_sent += pool.num_requests
+            connections += pool.num_connections
+        return {
+            "requests": requests_sent,
+            "connections": connections,
+            "reused": max(requests_sent - connections, 0),
+        }
+
+    def close(self):
+        """关闭所有连接，返回关闭前的统计"""
+        stats = self.stats()
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for s in sessions:
+            s.close()
+        self.adapter.close()
+        return stats
+
+
+# ====== suite 级共享 transport ======
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport(**kwargs):
+    """返回共享 Transport（首次调用时按 kwargs 创建）"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = Transport(**kwargs)
+        return _transport
+
+
+def close_transport():
+    """suite 结束时调用；返回连接统计（没有创建过则返回 None）"""
+    global _transport
+    with _transport_lock:
+        transport, _transport = _transport, None
+    if transport is None:
+        return None
+    return transport.close()
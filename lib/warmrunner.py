@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+__author__ = 'Qun Li'
+
+"""
+Warm runner for api_trigger.py (fork server).
+
+一个常驻的 zygote 进程预先 import 好框架（requests / openpyxl / HTMLTestRunner / run_demo），
+并 discover 一次测试（即加载好 case sheet）；之后每个 job 都从它 os.fork() 出来直接跑 run_demo.main()，
+省掉解释器启动 + import + 读 Excel + discover 的时间。
+
+协议（JSON lines）：
+    trigger -> zygote stdin : {"id", "args", "env", "log_path"}
+    zygote  -> trigger      : {"ready": true, "pid", "warmup_ms"}   启动完成
+                              {"id", "pid"}                          fork 成功
+                              {"id", "exit_code"}                    job 结束（被信号杀掉时为 -signum）
+                              {"id", "error"}                        fork 失败
+"""
+
+import os
+import sys
+import json
+import time
+import select
+import signal
+import unittest
+import importlib
+import threading
+import traceback
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# 有 job 在跑时，多久检查一次子进程退出
+POLL_SECONDS = 0.05
+
+
+# ====== zygote（在独立进程里运行）======
+
+# 预热时 import 的框架代码（相对 BASE_DIR）：改了任何一个都要重新预热，否则 fork 出来的 job 跑的是旧代码
+SOURCE_DIRS = ("lib", "package", "config", "testcase")
+SOURCE_FILES = ("run_demo.py",)
+
+
+def _source_files():
+    from config import setting
+    paths = [setting.SOURCE_FILE] + [os.path.join(BASE_DIR, name) for name in SOURCE_FILES]
+    for folder in SOURCE_DIRS:
+        folder = os.path.join(BASE_DIR, folder)
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".py"):
+                paths.append(os.path.join(folder, name))
+    return paths
+
+
+def _signature():
+    """case sheet + 框架 / 用例代码的 (size, mtime)：变了就重新预热"""
+    sig = []
+    for path in _source_files():
+        try:
+            st = os.stat(path)
+            sig.append((path, st.st_size, st.st_mtime_ns))
+        except OSError:
+            sig.append((path, None, None))
+    return sig
+
+
+def _forget_project_modules():
+    """丢掉已 import 的框架 / 用例模块（重新预热时重新 import 新代码、重新读 sheet）"""
+    roots = [os.path.join(BASE_DIR, d) + os.sep for d in SOURCE_DIRS]
+    files = {os.path.join(BASE_DIR, f) for f in SOURCE_FILES}
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if name == "__main__" or not path:
+            continue
+        path = os.path.abspath(path)
+        if path in files or any(path.startswith(root) for root in roots):
+            del sys.modules[name]
+            # from lib import x 会先取父包上的属性：一起删掉，才会 import 到新模块
+            parent, _, child = name.rpartition(".")
+            if parent in sys.modules and getattr(sys.modules[parent], child, None) is module:
+                delattr(sys.modules[parent], child)
+
+
+def _warm_up():
+    _forget_project_modules()
+    import run_demo
+    from config import setting
+
+    run_demo.add_case(setting.TEST_CASE, "*API.py")
+    return _signature()
+
+
+def _run_child(job):
+    """fork 出来的子进程：把 stdout/stderr 接到 job 日志，按 job 的环境变量跑 run_demo.main()"""
+    code = 1
+    try:
+        fd = os.open(job["log_path"], os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        os.dup2(fd, 1)
+        os.dup2(fd, 2)
+        os.close(fd)
+        null = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(null, 0)
+        os.close(null)
+        sys.stdout.reconfigure(line_buffering=True)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+        os.environ.clear()
+        os.environ.update(job["env"])
+        os.chdir(BASE_DIR)
+
+        # setting 在 import 时读取环境变量（TARGET_FILE 等），按本 job 的环境重新加载；
+        # import 时就按 setting 选定的模块级状态也要跟着重建（jsoncodec 的 JSON_CODEC）
+        from config import setting
+        importlib.reload(setting)
+        from lib import jsoncodec
+        jsoncodec.set_codec(setting.JSON_CODEC)
+
+        # 预热时 discover 过的 loader 记住了 top-level dir，换 --test-path 会报 "Start directory is not importable"
+        unittest.defaultTestLoader = unittest.TestLoader()
+
+        import run_demo
+        sys.argv = ["run_demo.py"] + list(job["args"])
+        # 别的 --test-path：预热时 import 的用例模块会和新目录里的同名模块冲突，丢掉重新 import
+        test_path = os.path.abspath(run_demo.parse_args().test_path)
+        test_dir = os.path.abspath(setting.TEST_CASE)
+        if test_path != test_dir:
+            for name, module in list(sys.modules.items()):
+                path = getattr(module, "__file__", None)
+                if path and os.path.abspath(path).startswith(test_dir + os.sep):
+                    del sys.modules[name]
+        code = run_demo.main()
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            # 不走 zygote 的清理逻辑 / atexit
+            os._exit(code if isinstance(code, int) else 1)
+
+
+def serve():
+    """zygote 主循环：单线程，只有它会 fork"""
+    # 协议走原 stdout 的副本；本进程普通 print 改到 stderr，避免污染协议
+    out = os.fdopen(os.dup(1), "w", buffering=1, encoding="utf-8")
+    os.dup2(2, 1)
+
+    def send(msg):
+        out.write(json.dumps(msg) + "\n")
+
+    # Ctrl-C 发给整个进程组时由 trigger 负责收尾，zygote 只在 stdin 关闭时退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    t0 = time.perf_counter()
+    signature = _warm_up()
+    send({"ready": True, "pid": os.getpid(), "warmup_ms": round((time.perf_counter() - t0) * 1000, 1)})
+
+    children = {}
+    stdin_fd = sys.stdin.fileno()
+    buf = b""
+    while True:
+        readable, _, _ = select.select([stdin_fd], [], [], POLL_SECONDS if children else None)
+
+        while children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            job_id = children.pop(pid, None)
+            if job_id is not None:
+                send({"id": job_id, "exit_code": os.waitstatus_to_exitcode(status)})
+
+        if not readable:
+            continue
+        chunk = os.read(stdin_fd, 65536)
+        if not chunk:
+            # trigger 退出了
+            return
+        buf += chunk
+        while b"\n" in buf:
+            line, buf = buf.split(b"\n", 1)
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            try:
+                if _signature() != signature:
+                    signature = _warm_up()
+                pid = os.fork()
+            except Exception as e:
+                send({"id": job["id"], "error": f"{type(e).__name__}: {e}"})
+                continue
+            if pid == 0:
+                out.close()
+                _run_child(job)
+            children[pid] = job["id"]
+            send({"id": job["id"], "pid": pid})
+
+
+# ====== trigger 端 ======
+
+class WarmProcess:
+    """从 zygote fork 出来的 job 进程；接口与 subprocess.Popen 的 terminate/kill/wait 对齐"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.pid = None
+        self.returncode = None
+        self.error = None
+        self._proc = None
+        self._started = threading.Event()
+        self._done = threading.Event()
+
+    def _signal(self, sig):
+        if self.pid is not None and not self._done.is_set():
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        self._signal(signal.SIGTERM)
+
+    def kill(self):
+        self._signal(signal.SIGKILL)
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise subprocess.TimeoutExpired(f"warm job {self.job_id}", timeout)
+        return self.returncode
+
+
+class SpawnCancelled(Exception):
+    """job 在 zygote fork 之前被取消（迟到的 fork 会被 reader 线程直接杀掉）"""
+
+
+class WarmRunner:
+    """
+    trigger 进程里的 zygote 客户端：spawn() 把 job 交给 zygote fork，zygote 挂了下次 spawn 时重启。
+
+    请求一旦写进 zygote 的 stdin，zygote 迟早会读到并 fork（重新预热时可能要等很久），
+    所以之后不能再回退到新的解释器，否则同一个 job 会跑两份；只能继续等，或者取消（abandon）。
+    """
+
+    def __init__(self, cwd=BASE_DIR, notice_seconds=10):
+        self.cwd = cwd
+        # 等 fork 超过这么久时在 job 日志里提示一次（zygote 可能在重新预热）
+        self.notice_seconds = notice_seconds
+        self.proc = None
+        self.ready = False
+        self.warmup_ms = None
+        self._pending = {}
+        # 已放弃的 job id：zygote 之后报上来的 pid 直接 SIGKILL
+        self._abandoned = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self._ensure_started()
+        return self
+
+    def _ensure_started(self):
+        if self.proc is not None and self.proc.poll() is None:
+            return
+        self.ready = False
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            cwd=self.cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+        threading.Thread(target=self._reader, args=(self.proc,), name="warm-runner", daemon=True).start()
+
+    def _reader(self, proc):
+        for line in proc.stdout:
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            if msg.get("ready"):
+                self.ready = True
+                self.warmup_ms = msg.get("warmup_ms")
+                continue
+            with self._lock:
+                handle = self._pending.get(msg.get("id"))
+                if handle is None:
+                    if msg.get("id") in self._abandoned:
+                        if "pid" in msg:
+                            self._kill(msg["pid"])
+                        else:
+                            self._abandoned.discard(msg["id"])
+                    continue
+                if "pid" in msg:
+                    handle.pid = msg["pid"]
+                    handle._started.set()
+                    continue
+                self._pending.pop(handle.job_id, None)
+            if "error" in msg:
+                handle.error = msg["error"]
+                handle._started.set()
+            else:
+                handle.returncode = msg.get("exit_code")
+            handle._done.set()
+
+        # zygote 退出：还没结束的 job 都拿不到退出码了
+        proc.wait()
+        with self._lock:
+            orphans = [h for h in self._pending.values() if h._proc is proc]
+            for h in orphans:
+                self._pending.pop(h.job_id, None)
+        for h in orphans:
+            h.error = h.error or f"warm runner exited ({proc.returncode})"
+            h.returncode = -1 if h.returncode is None else h.returncode
+            h._started.set()
+            h._done.set()
+
+    @staticmethod
+    def _kill(pid):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def _abandon(self, handle):
+        """不再等这个 job：已经 fork 了就杀掉，还没 fork 的等 pid 报上来时再杀"""
+        with self._lock:
+            self._pending.pop(handle.job_id, None)
+            if handle.pid is not None:
+                self._kill(handle.pid)
+            else:
+                self._abandoned.add(handle.job_id)
+
+    def spawn(self, job_id, args, env, log_path, cancelled=None):
+        """
+        fork 一个 job；返回已启动的 WarmProcess。
+        请求写入 zygote 之前出错、或 zygote 明确报告 fork 失败 / 自己退出时抛 RuntimeError（调用方可回退到普通子进程）；
+        cancelled() 返回 True 时放弃这个 job 并抛 SpawnCancelled。
+        """
+        handle = WarmProcess(job_id)
+        request = {"id": job_id, "args": list(args), "env": dict(env), "log_path": log_path}
+        with self._lock:
+            self._ensure_started()
+            handle._proc = self.proc
+            self._pending[job_id] = handle
+            try:
+                self.proc.stdin.write((json.dumps(request) + "\n").encode("utf-8"))
+                self.proc.stdin.flush()
+            except (OSError, ValueError) as e:
+                self._pending.pop(job_id, None)
+                raise RuntimeError(f"warm runner unavailable: {e}")
+
+        # 从这里开始不能回退：zygote 会在读到请求后 fork
+        waited, noticed = 0.0, False
+        while not handle._started.wait(POLL_SECONDS * 10):
+            waited += POLL_SECONDS * 10
+            if cancelled is not None and cancelled():
+                self._abandon(handle)
+                raise SpawnCancelled(f"job {job_id} cancelled before the warm runner forked it")
+            if not noticed and waited >= self.notice_seconds:
+                noticed = True
+                with open(log_path, "a", encoding="utf-8") as log:
+                    log.write(f"[INFO] waiting for the warm runner to fork the job ({waited:.0f}s; "
+                              f"it may be re-warming after a code or sheet change)\n")
+        if handle.pid is None:
+            raise RuntimeError(handle.error or "warm runner failed to fork the job")
+        return handle
+
+    def status(self):
+        alive = self.proc is not None and self.proc.poll() is None
+        return {
+            "alive": alive,
+            "ready": alive and self.ready,
+            "pid": self.proc.pid if alive else None,
+            "warmup_ms": self.warmup_ms,
+            "running_jobs": len(self._pending),
+        }
+
+    def close(self):
+        with self._lock:
+            proc, self.proc = self.proc, None
+        if proc is not None and proc.poll() is None:
+            proc.stdin.close()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+if __name__ == "__main__":
+    serve()
@@ -3,16 +3,42 @@
 __author__ = 'Qun Li'
 
 import os
+import time
+import atexit
 import shutil
+import threading
 from openpyxl import load_workbook
 from config import setting
 
 
 class WriteExcel:
-    """写入excel数据"""
+    """写入excel数据
 
-    def __init__(self, target_file):
+    默认模式：每次 write_data 都立即 save（兼容旧用法）。
+    buffered=True：作为整轮运行的 result sink，workbook 只打开一次，
+    结果先缓存在内存里，按 flush_rows / flush_seconds 或 close() 时统一落盘。
+    """
+
+    # 你项目里写第几列按原配置来；这里不改语义
+    RESULT_COL = 8
+
+    # 额外结果列（按表头名定位，不存在则追加到最后）
+    EXTRA_COLUMNS = {
+        "status": "actual_status",
+        "message": "actual_msg",
+        "latency": "latency_ms",
+        "ttfb": "ttfb_ms",
+        "connect": "connect_ms",
+        "request_bytes": "request_bytes",
+        "response_bytes": "response_bytes",
+        "reused": "conn_reused",
+    }
+
+    def __init__(self, target_file, buffered=False, flush_rows=0, flush_seconds=0):
         self.target_file = target_file
+        self.buffered = buffered
+        self.flush_rows = flush_rows or 0
+        self.flush_seconds = flush_seconds or 0
 
         # ✅ 关键修复：确保目标文件的父目录存在
         target_dir = os.path.dirname(self.target_file)
@@ -25,9 +51,149 @@ class WriteExcel:
         self.wb = load_workbook(self.target_file)
         self.ws = self.wb.active
 
-    def write_data(self, row_num, value):
-        """在指定行写入 Pass/Fail"""
-        # 你项目里写第几列按原配置来；这里不改语义
-        result_col = 8
-        self.ws.cell(row=row_num, column=result_col, value=value)
-        self.wb.save(self.target_file)
+        self._pending = {}
+        self._columns = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _column(self, header):
+        """按表头名找列号；没有就在最后追加一列"""
+        col = self._columns.get(header)
+        if col is None:
+            for cell in self.ws[1]:
+                if cell.value == header:
+                    col = cell.column
+                    break
+            else:
+                col = self.ws.max_column + 1
+                self.ws.cell(row=1, column=col, value=header)
+            self._columns[header] = col
+        return col
+
+    def _apply(self, row_num, value, extra):
+        self.ws.cell(row=row_num, column=self.RESULT_COL, value=value)
+        for key, v in extra.items():
+            if v is None:
+                continue
+            self.ws.cell(row=row_num, column=self._column(self.EXTRA_COLUMNS[key]), value=v)
+
+    def write_data(self, row_num, value, **extra):
+        """在指定行写入 Pass/Fail
+
+        extra: 可选的实际结果列（status/message/latency/ttfb/connect/...，见 EXTRA_COLUMNS）
+        """
+        unknown = set(extra) - set(self.EXTRA_COLUMNS)
+        if unknown:
+            raise ValueError(f"unknown result columns: {sorted(unknown)}")
+        if not self.buffered:
+            self._apply(row_num, value, extra)
+            self.wb.save(self.target_file)
+            return
+
+        with self._lock:
+            self._pending[row_num] = (value, extra)
+            due = (
+                (self.flush_rows and len(self._pending) >= self.flush_rows)
+                or (self.flush_seconds and time.monotonic() - self._last_flush >= self.flush_seconds)
+            )
+            if due:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._pending:
+            for row_num, (value, extra) in self._pending.items():
+                self._apply(row_num, value, extra)
+            self._pending.clear()
+            self.wb.save(self.target_file)
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        """把缓存的结果一次性写入文件"""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+
+
+class ResultCollector:
+    """只在内存里收集 write_data 调用，不碰 Excel 文件
+
+    多进程运行时子进程用它代替 WriteExcel，结果交回父进程统一写入，
+    避免多个进程同时改写 setting.TARGET_FILE。
+    """
+
+    def __init__(self):
+        self.rows = {}
+
+    def write_data(self, row_num, value, **extra):
+        self.rows[row_num] = (value, extra)
+
+    def replay(self, sink):
+        """把收集到的结果写进另一个 sink"""
+        for row_num, (value, extra) in self.rows.items():
+            sink.write_data(row_num, value, **extra)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class RecordingSink:
+    """转发给另一个 sink，同时留一份写入记录（--shard 用：结果随 shard payload 交给合并工具）"""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.rows = {}
+
+    def write_data(self, row_num, value, **extra):
+        self.rows[row_num] = (value, extra)
+        self.sink.write_data(row_num, value, **extra)
+
+    def flush(self):
+        self.sink.flush()
+
+    def close(self):
+        self.sink.close()
+
+
+# ====== 整轮运行共享的 result sink ======
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def set_result_sink(sink):
+    """替换共享 sink（例如多进程子进程装 ResultCollector），返回旧的"""
+    global _sink
+    with _sink_lock:
+        old, _sink = _sink, sink
+    return old
+
+
+def get_result_sink(target_file=None):
+    """返回本进程共享的 buffered WriteExcel（首次调用时创建）"""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = WriteExcel(
+                target_file or setting.TARGET_FILE,
+                buffered=True,
+                flush_rows=setting.EXCEL_FLUSH_ROWS,
+                flush_seconds=setting.EXCEL_FLUSH_SECONDS,
+            )
+        return _sink
+
+
+def close_result_sink():
+    """最终落盘并释放共享 sink；重复调用安全"""
+    global _sink
+    with _sink_lock:
+        sink, _sink = _sink, None
+    if sink is not None:
+        sink.close()
+
+
+# 崩溃/提前退出时兜底 flush
+atexit.register(close_result_sink)
@@ -9,18 +9,33 @@ Customized version (English UI) -- originally modified by YinJia (CN).
 __author__ = "Qun Li"
 __version__ = "0.8.2"
 
+import collections
 import datetime
 import io
+import json
+import os
+import re
 import sys
 import time
+import threading
 import unittest
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from xml.sax import saxutils
 
 
 class OutputRedirector(object):
-    """ Wrapper to redirect stdout or stderr """
+    """ Wrapper to redirect stdout or stderr (per thread; falls back to the original stream) """
     def __init__(self, fp):
-        self.fp = fp
+        self._default = fp
+        self._local = threading.local()
+
+    @property
+    def fp(self):
+        return getattr(self._local, "fp", None) or self._default
+
+    @fp.setter
+    def fp(self, fp):
+        self._local.fp = fp
 
     def write(self, s):
         self.fp.write(s)
@@ -325,6 +340,7 @@ a.popup_link:hover {
 <col align='right' />
 <col align='right' />
 <col align='right' />
+<col align='right' />
 </colgroup>
 <tr id='header_row'>
     <td>Test Suite / Test Case</td>
@@ -333,6 +349,7 @@ a.popup_link:hover {
     <td>Failed</td>
     <td>Error</td>
     <td>Details</td>
+    <td>Latency (ms)</td>
     <td>Screenshot</td>
 </tr>
 %(test_list)s
@@ -344,6 +361,7 @@ a.popup_link:hover {
     <td>%(error)s</td>
     <td>Pass Rate: %(passrate)s</td>
     <td>&nbsp;</td>
+    <td>&nbsp;</td>
 </tr>
 </table>
 <script>
@@ -360,6 +378,7 @@ a.popup_link:hover {
     <td>%(error)s</td>
     <td><a href="javascript:showClassDetail('%(cid)s',%(count)s)">View</a></td>
     <td>&nbsp;</td>
+    <td>&nbsp;</td>
 </tr>
 """
 
@@ -381,6 +400,7 @@ a.popup_link:hover {
             </pre>
         </div>
     </td>
+    <td>%(latency)s</td>
     <td>%(img)s</td>
 </tr>
 """
@@ -389,6 +409,7 @@ a.popup_link:hover {
 <tr id='%(tid)s' class='%(Class)s'>
     <td class='%(style)s'><div class='testcase'>%(desc)s</div></td>
     <td colspan='5' align='center'>%(status)s</td>
+    <td>%(latency)s</td>
     <td>%(img)s</td>
 </tr>
 """
@@ -399,12 +420,355 @@ a.popup_link:hover {
 
     ENDING_TMPL = """<div id='ending'>&nbsp;</div>"""
 
+    # -- streaming report (written incrementally; summary patched in at the end) --
+
+    STREAM_HEADING_ATTRIBUTE_TMPL = """<p class='attribute'><strong>%(name)s:</strong> <span id='attr_%(key)s'>%(value)s</span></p>
+"""
+
+    STREAM_REPORT_HEAD_TMPL = """
+<p id='show_detail_line'>View:
+<a href='javascript:showCase(0)'>Summary</a>
+<a href='javascript:showCase(1)'>Failed[<span id='view_fail'>...</span>]</a>
+<a href='javascript:showCase(2)'>Passed[<span id='view_pass'>...</span>]</a>
+<a href='javascript:showCase(3)'>All[<span id='view_count'>...</span>]</a>
+</p>
+<table id='result_table'>
+<colgroup>
+<col align='left' />
+<col align='right' />
+<col align='right' />
+<col align='right' />
+<col align='right' />
+<col align='right' />
+<col align='right' />
+<col align='right' />
+</colgroup>
+<tr id='header_row'>
+    <td>Test Suite / Test Case</td>
+    <td>Total</td>
+    <td>Passed</td>
+    <td>Failed</td>
+    <td>Error</td>
+    <td>Details</td>
+    <td>Latency (ms)</td>
+    <td>Screenshot</td>
+</tr>
+"""
+
+    STREAM_REPORT_CLASS_TMPL = r"""
+<tr id='%(cid)s_row' class='passClass'>
+    <td>%(desc)s</td>
+    <td id='%(cid)s_count'>...</td>
+    <td id='%(cid)s_pass'>...</td>
+    <td id='%(cid)s_fail'>...</td>
+    <td id='%(cid)s_error'>...</td>
+    <td><a id='%(cid)s_link' href="javascript:showClassDetail('%(cid)s',0)">View</a></td>
+    <td>&nbsp;</td>
+    <td>&nbsp;</td>
+</tr>
+"""
+
+    STREAM_REPORT_TAIL_TMPL = """
+<tr id='total_row'>
+    <td>Total</td>
+    <td>%(count)s</td>
+    <td>%(Pass)s</td>
+    <td>%(fail)s</td>
+    <td>%(error)s</td>
+    <td>Pass Rate: %(passrate)s</td>
+    <td>&nbsp;</td>
+    <td>&nbsp;</td>
+</tr>
+</table>
+<script>
+function setText(id, value) {
+    var el = document.getElementById(id);
+    if (el) { el.textContent = value; }
+}
+var attrs = %(attrs)s;
+for (var key in attrs) { setText('attr_' + key, attrs[key]); }
+setText('view_fail', '%(fail)s');
+setText('view_pass', '%(Pass)s');
+setText('view_count', '%(count)s');
+var classes = %(classes)s;
+for (var i = 0; i < classes.length; i++) {
+    var c = classes[i];
+    setText(c[0] + '_count', c[1] + c[2] + c[3]);
+    setText(c[0] + '_pass', c[1]);
+    setText(c[0] + '_fail', c[2]);
+    setText(c[0] + '_error', c[3]);
+    document.getElementById(c[0] + '_row').className = c[3] > 0 ? 'errorClass' : (c[2] > 0 ? 'failClass' : 'passClass');
+    document.getElementById(c[0] + '_link').href = "javascript:showClassDetail('" + c[0] + "'," + (c[1] + c[2] + c[3]) + ")";
+}
+drawCircle(%(Pass)s, %(fail)s, %(error)s)
+</script>
+"""
+
 
 TestResult = unittest.TestResult
 
 
+def _spill_name(test):
+    return re.sub(r'[^\w.-]+', '_', test.id())[:200] + '.log'
+
+
+class _BoundedOutput(object):
+    """
+    Per-test capture buffer with a size cap: keeps the first and last limit/2 characters
+    and drops the middle. With spill_path set, the full output is written to that file
+    once the cap is exceeded and the truncation note points to it.
+    """
+    def __init__(self, limit, spill_path=None, spill_ref=None):
+        self.limit = limit
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.spill_path = spill_path
+        self.spill_ref = spill_ref or spill_path
+        self.spilled = False
+        self.total = 0
+        self._head = []
+        self._head_len = 0
+        self._tail = collections.deque()
+        self._tail_len = 0
+        self._spill = None
+
+    def write(self, s):
+        if not s:
+            return
+        if self._spill is not None:
+            self._spill.write(s)
+        elif self.spill_path and self.total + len(s) > self.limit:
+            # nothing has been dropped yet: head + tail is everything written so far
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+            self._spill = io.open(self.spill_path, 'w', encoding='utf-8', errors='replace')
+            self._spill.write(''.join(self._head))
+            self._spill.write(''.join(self._tail))
+            self._spill.write(s)
+            self.spilled = True
+        self.total += len(s)
+
+        if self._head_len < self.head_limit:
+            part = s[:self.head_limit - self._head_len]
+            self._head.append(part)
+            self._head_len += len(part)
+            s = s[len(part):]
+            if not s:
+                return
+        self._tail.append(s)
+        self._tail_len += len(s)
+        while self._tail_len > self.tail_limit:
+            excess = self._tail_len - self.tail_limit
+            first = self._tail[0]
+            if len(first) <= excess:
+                self._tail.popleft()
+                self._tail_len -= len(first)
+            else:
+                self._tail[0] = first[excess:]
+                self._tail_len -= excess
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        if self._spill is not None:
+            self._spill.flush()
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def getvalue(self):
+        head = ''.join(self._head)
+        tail = ''.join(self._tail)
+        dropped = self.total - len(head) - len(tail)
+        if dropped <= 0:
+            return head + tail
+        note = '\n... [%d characters truncated' % dropped
+        if self.spilled:
+            note += '; full output: %s' % self.spill_ref
+        return head + note + '] ...\n' + tail
+
+
+class _StreamingReport(object):
+    """
+    Incremental report writer: the page header goes out first, each test row is
+    appended (and flushed) as the case finishes, and the summary is written at the end.
+    Only per-class counters are kept in memory; a crashed run leaves a readable partial report.
+
+    Concurrent runs finish cases out of order: rows that carry a discovery ordinal are held
+    back until every earlier ordinal has been written (or skipped), so the streamed report has
+    the same order as a serial one. At most REORDER_WINDOW rows are held; beyond that the
+    earliest held row is written anyway (a gap means an earlier case is still running).
+    """
+    REORDER_WINDOW = 256
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.stream = runner.stream
+        self.classes = {}
+        self._next = 0
+        self._held = {}
+
+    def _write(self, text):
+        self.stream.write(text.encode('utf8'))
+        try:
+            self.stream.flush()
+        except Exception:
+            pass
+
+    def start(self):
+        r = self.runner
+        head, rest = r.HTML_TMPL.split('%(heading)s', 1)
+        self._html_tail = rest.split('%(ending)s', 1)[1]
+
+        attrs = [
+            ('Tester', 'Tester', r.tester),
+            ('Start Time', 'StartTime', str(r.startTime)[:19]),
+            ('Duration', 'Duration', 'running...'),
+            ('Summary', 'Summary', 'running...'),
+        ]
+        parameters = ''.join(
+            r.STREAM_HEADING_ATTRIBUTE_TMPL % dict(
+                name=saxutils.escape(name), key=key, value=saxutils.escape(value)
+            )
+            for name, key, value in attrs
+        )
+        heading = r.HEADING_TMPL % dict(
+            title=saxutils.escape(r.title),
+            parameters=parameters,
+            description=saxutils.escape(r.description),
+            tester=saxutils.escape(r.tester),
+        )
+        self._write(
+            head % dict(
+                title=saxutils.escape(r.title),
+                generator='HTMLTestRunner %s' % __version__,
+                stylesheet=r._generate_stylesheet(),
+            )
+            + heading
+            + '\n'
+            + r.STREAM_REPORT_HEAD_TMPL
+        )
+
+    def write_test(self, n, test, output, exc, ordinal=None):
+        if ordinal is None:
+            self._write_row(n, test, output, exc)
+            return
+        self._held[ordinal] = (n, test, output, exc)
+        self._release()
+
+    def skip(self, ordinal):
+        """A skipped case has no row, but its ordinal no longer holds back later rows."""
+        if ordinal is not None:
+            self._held[ordinal] = None
+            self._release()
+
+    def _release(self, flush=False):
+        while self._held:
+            if self._next not in self._held:
+                if not flush and len(self._held) <= self.REORDER_WINDOW:
+                    return
+                self._next = min(self._held)
+            row = self._held.pop(self._next)
+            self._next += 1
+            if row is not None:
+                self._write_row(*row)
+
+    def _write_row(self, n, test, output, exc):
+        cls = getattr(test, "report_class", test.__class__)
+        entry = self.classes.get(cls)
+        if entry is None:
+            cid = len(self.classes)
+            entry = self.classes[cls] = [cid, 0, 0, 0]
+            self._write(self.runner.STREAM_REPORT_CLASS_TMPL % dict(
+                desc=self.runner._class_description(cls),
+                cid='c%s' % (cid + 1),
+            ))
+        tid = entry[1] + entry[2] + entry[3]
+        entry[1 + n] += 1
+
+        rows = []
+        self.runner._generate_report_test(rows, entry[0], tid, n, test, output, exc)
+        self._write(''.join(rows))
+
+    def finish(self, result):
+        self._release(flush=True)
+        r = self.runner
+        report_attrs = r.getReportAttributes(result)
+        attrs = dict((name.replace(' ', ''), value) for name, value in report_attrs)
+        classes = [['c%s' % (cid + 1), np, nf, ne] for cid, np, nf, ne in self.classes.values()]
+        self._write(
+            r.STREAM_REPORT_TAIL_TMPL % dict(
+                count=str(result.success_count + result.failure_count + result.error_count),
+                Pass=str(result.success_count),
+                fail=str(result.failure_count),
+                error=str(result.error_count),
+                passrate=r.passrate,
+                attrs=json.dumps(attrs).replace('</', '<\\/'),
+                classes=json.dumps(classes),
+            )
+            + '\n'
+            + r._generate_ending()
+            + self._html_tail
+        )
+
+
+def _copy_outcome(source, target):
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+def _iter_tests(suite):
+    """Flatten nested TestSuites into individual test cases (discovery order)."""
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from _iter_tests(test)
+        else:
+            yield test
+
+
+_remote_classes = {}
+
+
+def _remote_class(module, name, doc):
+    """Recreate a stand-in class so merged results group under the original TestCase class."""
+    cls = _remote_classes.get((module, name))
+    if cls is None:
+        cls = type(name, (object,), {"__module__": module, "__doc__": doc})
+        _remote_classes[(module, name)] = cls
+    return cls
+
+
+class _RemoteTest(object):
+    """ Lightweight stand-in for a test case that was executed in another process """
+    def __init__(self, test_id, description, cls_info, img="", metrics=None, duration=None):
+        self._id = test_id
+        self._description = description
+        self.report_class = _remote_class(*cls_info)
+        self.img = img
+        self.metrics = metrics
+        self.duration = duration
+
+    def id(self):
+        return self._id
+
+    def shortDescription(self):
+        return self._description
+
+    def __str__(self):
+        return self._id
+
+
 class _TestResult(TestResult):
-    def __init__(self, verbosity=2):
+    # once the suite budget is used up, each further test keeps only this much of its output
+    BUDGET_EXCEEDED_KEEP = 1024
+
+    def __init__(self, verbosity=2, report_writer=None, capture_limit=0, capture_budget=0, spill_dir=None,
+                 sinks=()):
         TestResult.__init__(self)
         self.stdout0 = None
         self.stderr0 = None
@@ -415,17 +779,167 @@ class _TestResult(TestResult):
         self.result = []
         self.passrate = float(0)
         self.status = 0
+        # thread-safe bookkeeping for the concurrent runner
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._order = {}
+        # streaming mode: rows go straight to the report, only compact entries are kept
+        self.report_writer = report_writer
+        # bounded capture: per-test cap (head + tail), suite-wide budget of retained output,
+        # optional spill of oversized output to <spill_dir>/<test id>.log (0 = unlimited)
+        self.capture_limit = capture_limit or 0
+        self.capture_budget = capture_budget or 0
+        self.spill_dir = spill_dir
+        self.retained_output = 0
+        # incremental result sinks (NDJSON / JUnit XML ...): write_test / write_skip / close
+        self.sinks = list(sinks or ())
+
+    def _spill_target(self, test):
+        if not self.spill_dir:
+            return None, None
+        name = _spill_name(test)
+        # reference is relative to the report directory (the spill dir's parent)
+        return os.path.join(self.spill_dir, name), os.path.join(os.path.basename(self.spill_dir), name)
+
+    def _apply_budget(self, test, output, buf=None):
+        """Called under the lock: keep the retained output of the whole suite within capture_budget."""
+        if self.capture_budget and self.retained_output + len(output) > self.capture_budget \
+                and len(output) > self.BUDGET_EXCEEDED_KEEP:
+            note = '[suite output budget exhausted; %d characters dropped' % (len(output) - self.BUDGET_EXCEEDED_KEEP)
+            if isinstance(buf, _BoundedOutput) and buf.spilled:
+                note += '; full output: %s' % buf.spill_ref
+            else:
+                path, ref = self._spill_target(test)
+                if path:
+                    try:
+                        os.makedirs(self.spill_dir, exist_ok=True)
+                        with io.open(path, 'w', encoding='utf-8', errors='replace') as f:
+                            f.write(output)
+                        note += '; full output: %s' % ref
+                    except OSError:
+                        pass
+            output = note + '] ...\n' + output[-self.BUDGET_EXCEEDED_KEEP:]
+        self.retained_output += len(output)
+        return output
+
+    def _emit(self, method, *args):
+        """Called under the lock; a failing sink is reported once and dropped, the run goes on."""
+        for sink in list(self.sinks):
+            try:
+                getattr(sink, method)(*args)
+            except Exception as e:
+                sys.__stderr__.write('[WARN] result sink %s failed, disabled: %s\n' % (type(sink).__name__, e))
+                self.sinks.remove(sink)
+
+    def close_sinks(self):
+        for sink in self.sinks:
+            try:
+                sink.close(self)
+            except Exception as e:
+                sys.__stderr__.write('[WARN] failed to close result sink %s: %s\n' % (type(sink).__name__, e))
+
+    def _stop_clock(self, test):
+        started = getattr(self._local, "started", None)
+        if started is not None and getattr(test, "duration", None) is None:
+            test.duration = time.perf_counter() - started
+
+    def _record(self, n, test, output, exc, buf=None):
+        with self._lock:
+            self._emit('write_test', n, test, output, exc)
+            if self.report_writer is None:
+                output = self._apply_budget(test, output, buf)
+            if self.report_writer is not None:
+                self.report_writer.write_test(n, test, output, exc, self._order.get(id(test)))
+                self.result.append((n, test, '', ''))
+            else:
+                self.result.append((n, test, output, exc))
+
+    @property
+    def outputBuffer(self):
+        return getattr(self._local, "outputBuffer", None)
+
+    @outputBuffer.setter
+    def outputBuffer(self, buf):
+        self._local.outputBuffer = buf
+
+    def set_order(self, tests, ordinals=None):
+        """Remember discovery order so results can be sorted after a concurrent run."""
+        if ordinals is None:
+            ordinals = range(len(tests))
+        self._order = {id(t): i for t, i in zip(tests, ordinals)}
+
+    def export(self):
+        """Compact, picklable copy of the collected results (for the multi-process runner)."""
+        def info(test):
+            cls = getattr(test, "report_class", test.__class__)
+            return (
+                self._order.get(id(test), 0),
+                test.id(),
+                test.shortDescription() or "",
+                (cls.__module__, cls.__name__, cls.__doc__),
+            )
+
+        return {
+            "testsRun": self.testsRun,
+            "records": [
+                info(t) + (n, o, e, getattr(t, "img", ""), getattr(t, "metrics", None), getattr(t, "duration", None))
+                for n, t, o, e in self.result
+            ],
+            "skipped": [info(t) + (reason, getattr(t, "duration", None)) for t, reason in self.skipped],
+        }
+
+    def merge(self, payload):
+        """Fold an export() payload from another process into this result."""
+        with self._lock:
+            self.testsRun += payload["testsRun"]
+            # skips first: a streaming report must not hold rows back waiting for a skipped ordinal
+            for ordinal, test_id, desc, cls_info, reason, duration in payload["skipped"]:
+                test = _RemoteTest(test_id, desc, cls_info, duration=duration)
+                self._order[id(test)] = ordinal
+                self.skipped.append((test, reason))
+                self._emit('write_skip', test, reason)
+                if self.report_writer is not None:
+                    self.report_writer.skip(ordinal)
+            for ordinal, test_id, desc, cls_info, n, o, e, img, metrics, duration in payload["records"]:
+                test = _RemoteTest(test_id, desc, cls_info, img, metrics, duration)
+                self._order[id(test)] = ordinal
+                self._record(n, test, o, e)
+                if n == 0:
+                    self.success_count += 1
+                elif n == 1:
+                    self.failure_count += 1
+                    self.failures.append((test, e))
+                else:
+                    self.error_count += 1
+                    self.errors.append((test, e))
+            if self.failure_count or self.error_count:
+                self.status = 1
+
+    def sort_results(self):
+        key = lambda item: self._order.get(id(item[1]), len(self._order))
+        with self._lock:
+            self.result.sort(key=key)
+            self.failures.sort(key=lambda item: self._order.get(id(item[0]), len(self._order)))
+            self.errors.sort(key=lambda item: self._order.get(id(item[0]), len(self._order)))
 
     def startTest(self, test):
-        TestResult.startTest(self, test)
+        with self._lock:
+            TestResult.startTest(self, test)
         test.img = ""
-        self.outputBuffer = io.StringIO()
+        test.duration = None
+        self._local.started = time.perf_counter()
+        if self.capture_limit:
+            self.outputBuffer = _BoundedOutput(self.capture_limit, *self._spill_target(test))
+        else:
+            self.outputBuffer = io.StringIO()
         stdout_redirector.fp = self.outputBuffer
         stderr_redirector.fp = self.outputBuffer
-        self.stdout0 = sys.stdout
-        self.stderr0 = sys.stderr
-        sys.stdout = stdout_redirector
-        sys.stderr = stderr_redirector
+        # serial mode swaps sys.stdout per test; the concurrent runner installs it once
+        if sys.stdout is not stdout_redirector:
+            self.stdout0 = sys.stdout
+            self.stderr0 = sys.stderr
+            sys.stdout = stdout_redirector
+            sys.stderr = stderr_redirector
 
     def complete_output(self):
         if self.stdout0:
@@ -433,17 +947,27 @@ class _TestResult(TestResult):
             sys.stderr = self.stderr0
             self.stdout0 = None
             self.stderr0 = None
-        return self.outputBuffer.getvalue()
+        stdout_redirector.fp = None
+        stderr_redirector.fp = None
+        buf = self.outputBuffer
+        if buf is None:
+            return ''
+        if isinstance(buf, _BoundedOutput):
+            buf.close()
+        return buf.getvalue()
 
     def stopTest(self, test):
+        self._local.started = None
         self.complete_output()
 
     def addSuccess(self, test):
-        self.success_count += 1
-        self.status = 0
-        TestResult.addSuccess(self, test)
+        self._stop_clock(test)
+        with self._lock:
+            self.success_count += 1
+            self.status = 0
+            TestResult.addSuccess(self, test)
         output = self.complete_output()
-        self.result.append((0, test, output, ''))
+        self._record(0, test, output, '', self.outputBuffer)
         if self.verbosity > 1:
             sys.stderr.write('ok ')
             sys.stderr.write(str(test))
@@ -452,12 +976,14 @@ class _TestResult(TestResult):
             sys.stderr.write('.')
 
     def addError(self, test, err):
-        self.error_count += 1
-        self.status = 1
-        TestResult.addError(self, test, err)
-        _, _exc_str = self.errors[-1]
+        self._stop_clock(test)
+        with self._lock:
+            self.error_count += 1
+            self.status = 1
+            TestResult.addError(self, test, err)
+            _, _exc_str = self.errors[-1]
         output = self.complete_output()
-        self.result.append((2, test, output, _exc_str))
+        self._record(2, test, output, _exc_str, self.outputBuffer)
         try:
             driver = getattr(test, "driver")
             test.img = driver.get_screenshot_as_base64()
@@ -471,12 +997,14 @@ class _TestResult(TestResult):
             sys.stderr.write('E')
 
     def addFailure(self, test, err):
-        self.failure_count += 1
-        self.status = 1
-        TestResult.addFailure(self, test, err)
-        _, _exc_str = self.failures[-1]
+        self._stop_clock(test)
+        with self._lock:
+            self.failure_count += 1
+            self.status = 1
+            TestResult.addFailure(self, test, err)
+            _, _exc_str = self.failures[-1]
         output = self.complete_output()
-        self.result.append((1, test, output, _exc_str))
+        self._record(1, test, output, _exc_str, self.outputBuffer)
         try:
             driver = getattr(test, "driver")
             test.img = driver.get_screenshot_as_base64()
@@ -489,11 +1017,29 @@ class _TestResult(TestResult):
         else:
             sys.stderr.write('F')
 
+    def addSkip(self, test, reason):
+        self._stop_clock(test)
+        with self._lock:
+            TestResult.addSkip(self, test, reason)
+            self._emit('write_skip', test, reason)
+            if self.report_writer is not None:
+                self.report_writer.skip(self._order.get(id(test)))
+
 
 class HTMLTestRunner(Template_mixin):
-    def __init__(self, stream=sys.stdout, verbosity=2, title=None, description=None, tester=None):
+    def __init__(self, stream=sys.stdout, verbosity=2, title=None, description=None, tester=None, workers=1,
+                 streaming=False, capture_limit=0, capture_budget=0, spill_dir=None, sinks=(), chains=None):
         self.stream = stream
         self.verbosity = verbosity
+        self.workers = max(int(workers or 1), 1)
+        self.streaming = streaming
+        self._stream_report = None
+        self.capture_limit = capture_limit
+        self.capture_budget = capture_budget
+        self.spill_dir = spill_dir
+        self.sinks = list(sinks or ())
+        # {test id: chain key}: cases of one chain run one after another (in order) when workers > 1
+        self.chains = chains or {}
 
         self.title = self.DEFAULT_TITLE if title is None else title
         self.description = self.DEFAULT_DESCRIPTION if description is None else description
@@ -502,18 +1048,92 @@ class HTMLTestRunner(Template_mixin):
         self.startTime = datetime.datetime.now()
 
     def run(self, test):
-        result = _TestResult(self.verbosity)
-        test(result)
+        result = self.make_result()
+        self.execute(test, result)
+        return self.finish(test, result)
+
+    def make_result(self):
+        """Create the result object; in streaming mode the report header is written now."""
+        if self.streaming:
+            self._stream_report = _StreamingReport(self)
+            self._stream_report.start()
+        return _TestResult(
+            self.verbosity, report_writer=self._stream_report, capture_limit=self.capture_limit,
+            capture_budget=self.capture_budget, spill_dir=self.spill_dir, sinks=self.sinks,
+        )
+
+    def execute(self, test, result):
+        if self.workers > 1:
+            self._run_concurrent(test, result)
+        else:
+            test(result)
+
+    def finish(self, test, result):
+        """Stop the clock and write the report for an already-populated result."""
         self.stopTime = datetime.datetime.now()
-        self.generateReport(test, result)
+        result.close_sinks()
+        if self._stream_report is not None:
+            self._stream_report.finish(result)
+        else:
+            self.generateReport(test, result)
         print(sys.stderr, '\nTime Elapsed: %s' % (self.stopTime - self.startTime))
         return result
 
+    def _run_concurrent(self, test, result):
+        """
+        Run individual test cases on a bounded thread pool.
+        Class/module fixtures are not invoked here (the suite's own fixture handling
+        is serial by design); results are re-sorted into discovery order afterwards.
+        Cases sharing a chain key are submitted only when the previous case of the chain is done.
+        """
+        assign_order = not result._order
+        tails = {}
+
+        def submit(pool, t):
+            key = self.chains.get(t.id())
+            previous = tails.get(key) if key is not None else None
+            if previous is None or previous.done():
+                future = pool.submit(t, result)
+            else:
+                future = Future()
+
+                def start(_, t=t, future=future):
+                    try:
+                        inner = pool.submit(t, result)
+                    except Exception as e:
+                        future.set_exception(e)
+                        return
+                    inner.add_done_callback(lambda f: _copy_outcome(f, future))
+                previous.add_done_callback(start)
+            if key is not None:
+                tails[key] = future
+            return future
+
+        stdout0, stderr0 = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = stdout_redirector, stderr_redirector
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="case") as pool:
+                # cases are created lazily by data-driven suites: keep only a bounded window in flight
+                pending = set()
+                for i, t in enumerate(_iter_tests(test)):
+                    if assign_order:
+                        result._order[id(t)] = i
+                    pending.add(submit(pool, t))
+                    if len(pending) >= self.workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                for future in pending:
+                    future.result()
+        finally:
+            sys.stdout, sys.stderr = stdout0, stderr0
+        result.sort_results()
+
     def sortResult(self, result_list):
         rmap = {}
         classes = []
         for n, t, o, e in result_list:
-            cls = t.__class__
+            cls = getattr(t, "report_class", t.__class__)
             if not cls in rmap:
                 rmap[cls] = []
                 classes.append(cls)
@@ -597,12 +1217,7 @@ class HTMLTestRunner(Template_mixin):
                 else:
                     ne += 1
 
-            if cls.__module__ == "__main__":
-                name = cls.__name__
-            else:
-                name = "%s.%s" % (cls.__module__, cls.__name__)
-            doc = cls.__doc__ and cls.__doc__.split("\n")[0] or ""
-            desc = doc and '%s: %s' % (name, doc) or name
+            desc = self._class_description(cls)
 
             row = self.REPORT_CLASS_TMPL % dict(
                 style=ne > 0 and 'errorClass' or nf > 0 and 'failClass' or 'passClass',
@@ -628,6 +1243,14 @@ class HTMLTestRunner(Template_mixin):
         )
         return report
 
+    def _class_description(self, cls):
+        if cls.__module__ == "__main__":
+            name = cls.__name__
+        else:
+            name = "%s.%s" % (cls.__module__, cls.__name__)
+        doc = cls.__doc__ and cls.__doc__.split("\n")[0] or ""
+        return doc and '%s: %s' % (name, doc) or name
+
     def _generate_report_test(self, rows, cid, tid, n, t, o, e):
         has_output = bool(o or e)
         tid = (n == 0 and 'p' or 'f') + 't%s.%s' % (cid + 1, tid + 1)
@@ -667,12 +1290,29 @@ class HTMLTestRunner(Template_mixin):
             desc=desc,
             script=script,
             status=self.STATUS[n],
+            latency=self._format_metrics(getattr(t, "metrics", None)),
             img=img,
         )
         rows.append(row)
         if not has_output:
             return
 
+    def _format_metrics(self, metrics):
+        """Total latency cell; connect/TTFB/bytes/reuse breakdown goes into the tooltip."""
+        if not metrics or metrics.get("total_ms") is None:
+            return "&nbsp;"
+        parts = []
+        for key, label, unit in (("connect_ms", "connect", " ms"), ("ttfb_ms", "ttfb", " ms"),
+                                 ("request_bytes", "req", " B"), ("response_bytes", "resp", " B")):
+            if metrics.get(key) is not None:
+                parts.append("%s %s%s" % (label, metrics[key], unit))
+        if metrics.get("reused") is not None:
+            parts.append("reused %s" % ("yes" if metrics["reused"] else "no"))
+        if (metrics.get("attempts") or 1) > 1:
+            parts.append("attempts %s" % metrics["attempts"])
+        return "<span title='%s'>%.1f</span>" % (
+            saxutils.escape(" | ".join(parts), {"'": "&#39;"}), metrics["total_ms"])
+
     def _generate_ending(self):
         return self.ENDING_TMPL
 
@@ -8,12 +8,30 @@ import time
 import unittest
 import shutil
 import argparse
+import datetime
 import requests
 
 sys.path.append(os.path.dirname(__file__))
 
 from config import setting
 from package.HTMLTestRunner import HTMLTestRunner
+from lib.cassette import close_cassette, open_cassette
+from lib.casecache import load_cases
+from lib.chaining import build_graph, reset_variables
+from lib.datadriven import iter_entries, subset
+from lib import history
+from lib.history import record_run
+from lib.loadgen import parse_duration, print_load_report, run_load, write_load_report
+from lib.metrics import write_metrics_file
+from lib import perfgate
+from lib.procrunner import run_in_processes
+from lib import resilience
+from lib.resultsinks import JUnitXMLSink, NDJSONSink
+from lib.selection import RunState, select_cases
+from lib import sharding
+from lib.sendrequests import case_spec
+from lib.transport import get_transport, close_transport
+from lib.writeexcel import RecordingSink, close_result_sink, get_result_sink, set_result_sink
 
 
 def add_case(test_path: str, pattern: str) -> unittest.TestSuite:
@@ -25,28 +43,83 @@ def env(name: str, default: str) -> str:
     return v if v and v.strip() else default
 
 
-def reset_test_data(base_url: str, reset_path: str) -> bool:
+def reset_test_data(base_url: str, reset_path: str, namespace: bool = False) -> bool:
+    """
+    Reset the target API's data.
+    - namespace=True: ask for a fresh isolated dataset; its run ID is exported as RUN_ID
+      so every request of this run (and its worker processes) carries the X-Run-Id header
+    - otherwise reset the namespace named by RUN_ID (or the default one)
+    """
+    if namespace:
+        ns_url = base_url.rstrip("/") + "/api/test/namespace"
+        try:
+            r = requests.post(ns_url, timeout=5)
+            r.raise_for_status()
+            run_id = r.json()["data"]["run_id"]
+            os.environ["RUN_ID"] = run_id
+            print(f"[INFO] namespace OK -> RUN_ID={run_id}")
+            return True
+        except Exception as e:
+            print(f"[WARN] namespace request failed -> {e} (url={ns_url}); falling back to reset")
+
     reset_url = base_url.rstrip("/") + reset_path
+    run_id = os.getenv("RUN_ID")
+    headers = {setting.RUN_ID_HEADER: run_id} if run_id else None
     try:
-        r = requests.post(reset_url, timeout=5)
+        r = requests.post(reset_url, headers=headers, timeout=5)
         r.raise_for_status()
-        print(f"[INFO] reset OK -> {reset_url}")
+        print(f"[INFO] reset OK -> {reset_url}" + (f" (RUN_ID={run_id})" if run_id else ""))
         return True
     except Exception as e:
         print(f"[WARN] reset failed -> {e} (url={reset_url})")
         return False
 
 
-def run_case(suite: unittest.TestSuite, report_dir: str, title: str, description: str, tester: str):
+def run_case(suite: unittest.TestSuite, report_dir: str, title: str, description: str, tester: str,
+             workers: int = 1, processes: int = 1, test_path: str = None, stream_report: bool = False,
+             pattern: str = "*API.py", spill_output: bool = False, ndjson: bool = False,
+             junit_xml: bool = False, chains: dict = None):
     os.makedirs(report_dir, exist_ok=True)
 
     now = time.strftime("%Y-%m-%d_%H_%M_%S")
     report_path = os.path.join(report_dir, f"{now}_result.html")
     latest_path = os.path.join(report_dir, "latest.html")
 
-    with open(report_path, "wb") as fp:
-        runner = HTMLTestRunner(stream=fp, title=title, description=description, tester=tester)
-        result = runner.run(suite)
+    # 增量结果文件：每个 case 结束就落盘（run 超时被杀也能拿到已完成部分）
+    sinks = []
+    if ndjson:
+        sinks.append(NDJSONSink(os.path.join(report_dir, f"{now}_results.ndjson")))
+    if junit_xml:
+        sinks.append(JUnitXMLSink(os.path.join(report_dir, f"{now}_junit.xml"), suite_name=title))
+
+    # suite 级共享连接池：池大小至少要覆盖并发 worker 数（多进程模式下由子进程各自创建）
+    if processes <= 1:
+        get_transport(pool_maxsize=max(setting.HTTP_POOL_MAXSIZE, workers))
+
+    try:
+        with open(report_path, "wb") as fp:
+            runner = HTMLTestRunner(
+                stream=fp, title=title, description=description, tester=tester, workers=workers,
+                streaming=stream_report, capture_limit=setting.CAPTURE_CASE_LIMIT,
+                capture_budget=setting.CAPTURE_BUDGET,
+                spill_dir=os.path.join(report_dir, f"{now}_output") if spill_output else None,
+                sinks=sinks, chains=chains,
+            )
+            if processes > 1:
+                result = run_in_processes(runner, suite, test_path, processes, pattern=pattern)
+            else:
+                result = runner.run(suite)
+    finally:
+        # Excel 结果是 buffered 的：无论成功/异常都在这里统一落盘一次
+        try:
+            close_result_sink()
+        except Exception as e:
+            print(f"[WARN] Failed to flush Excel results: {e}")
+        transport_stats = close_transport()
+
+    if processes <= 1:
+        result.transport_stats = transport_stats
+    result.sink_paths = {type(s).__name__: s.path for s in sinks}
 
     try:
         shutil.copyfile(report_path, latest_path)
@@ -54,9 +127,99 @@ def run_case(suite: unittest.TestSuite, report_dir: str, title: str, description
     except Exception as e:
         print(f"[WARN] Failed to write latest.html: {e}")
 
+    # 每个 case 的请求耗时明细（机器可读）
+    try:
+        result.metrics_path = write_metrics_file(result, os.path.join(report_dir, f"{now}_metrics.json"))
+    except Exception as e:
+        print(f"[WARN] Failed to write metrics file: {e}")
+
     return result, report_path, latest_path
 
 
+def run_load_mode(args) -> int:
+    """Replay the Excel cases as a load profile (open-loop, fixed rate)."""
+    try:
+        duration = parse_duration(args.duration)
+        cases = load_cases(setting.SOURCE_FILE, "Sheet1")
+    except Exception as e:
+        print(f"[ERROR] Failed to prepare load run: {e}")
+        return 2
+
+    print(f"[INFO] load: rps={args.rps} duration={duration}s concurrency={args.concurrency}")
+    try:
+        summary = run_load(cases, args.rps, duration, args.concurrency, seed=args.seed)
+    except Exception as e:
+        print(f"[ERROR] Load run failed: {e}")
+        return 2
+
+    print_load_report(summary)
+    os.makedirs(args.report_dir, exist_ok=True)
+    now = time.strftime("%Y-%m-%d_%H_%M_%S")
+    path = write_load_report(summary, os.path.join(args.report_dir, f"{now}_load.json"))
+    print(f"LOAD_REPORT_PATH={os.path.abspath(path)}")
+    return 0 if summary["errors"] == 0 else 1
+
+
+def run_perf_gate(args, result):
+    """重发通过的 case 采样，检查 Excel 预算列与基线；返回回归列表（None = 采样失败）"""
+    try:
+        rows = load_cases(setting.SOURCE_FILE, "Sheet1")
+        collected = perfgate.collect_samples(result, rows, samples=args.perf_samples)
+    except Exception as e:
+        print(f"[WARN] Failed to sample latency for the perf gate: {e}")
+        return None
+    summary = perfgate.summarize(collected)
+
+    baseline_path = args.perf_baseline or os.path.join(args.report_dir, "perf_baseline.json")
+    baseline = None
+    if args.perf_update_baseline:
+        perfgate.save_baseline(summary, baseline_path, args.perf_samples)
+        print(f"PERF_BASELINE_PATH={os.path.abspath(baseline_path)} (updated)")
+    else:
+        baseline = perfgate.load_baseline(baseline_path)
+        if baseline is None:
+            print(f"[WARN] no perf baseline at {baseline_path}; checking Excel budgets only "
+                  f"(create one with --perf-update-baseline)")
+
+    regressions = perfgate.check(collected, summary, baseline)
+    print(f"PERF_CASES={len(summary['cases'])}")
+    counts = [stats["count"] for stats in summary["cases"].values()]
+    if counts:
+        print(f"PERF_SAMPLES_PER_CASE={min(counts)}-{max(counts)}" if min(counts) != max(counts)
+              else f"PERF_SAMPLES_PER_CASE={counts[0]}")
+    print(f"PERF_RESAMPLED_CASES={collected['resampled']}/{len(summary['cases'])}")
+    if collected["dropped"]:
+        print(f"PERF_DROPPED_SAMPLES={collected['dropped']} (status differs from the functional run)")
+    print(f"PERF_REGRESSIONS={len(regressions)}")
+    if regressions:
+        perfgate.print_regressions(regressions)
+    return regressions
+
+
+def apply_shard(args, suite, shard, chains):
+    """返回 (本 shard 的 suite, 完整分配, {test_id: 完整 suite 里的序号})"""
+    index, count = shard
+    entries = list(iter_entries(suite))
+    durations = None
+    if args.shard_balance:
+        if os.path.exists(args.shard_history):
+            conn = history.connect(args.shard_history)
+            try:
+                durations = history.case_durations(conn)
+            finally:
+                conn.close()
+        if not durations:
+            print(f"[WARN] no case durations in {args.shard_history}; sharding by ID hash")
+
+    plan = sharding.assign(entries, count, chains=chains, durations=durations)
+    mine = [test_id for test_id, _ in entries if plan[test_id] == index]
+    print(f"SHARD={index}/{count}")
+    print(f"SHARD_PLAN={sharding.plan_fingerprint(plan)}")
+    print(f"SHARD_CASES={len(mine)}/{len(entries)}")
+    ordinals = {test_id: i for i, (test_id, _) in enumerate(entries)}
+    return subset(suite, mine), plan, ordinals
+
+
 def dump_result_details(result, max_lines=80):
     # 把 errors/failures 的 traceback 打出来（否则 Jenkins 控制台只看到一堆 E）
     def _tail(tb: str) -> str:
@@ -94,6 +257,66 @@ def parse_args():
     p.add_argument("--title", default="E-commerce API Automation Test Report")
     p.add_argument("--description", default="Python Requests + Unittest + DDT + Excel (Data-Driven)")
     p.add_argument("--tester", default="Qun Li")
+    p.add_argument("--workers", type=int, default=int(env("WORKERS", "1")),
+                   help="run cases concurrently on N threads (default 1 = serial)")
+    p.add_argument("--processes", type=int, default=int(env("PROCESSES", "1")),
+                   help="partition cases across N worker processes and merge into one report")
+    p.add_argument("--namespace", action="store_true", default=env("NAMESPACE", "0") == "1",
+                   help="run against a fresh isolated dataset on the target API (X-Run-Id)")
+    p.add_argument("--stream-report", action="store_true", default=env("STREAM_REPORT", "0") == "1",
+                   help="write the HTML report incrementally as each case finishes")
+    p.add_argument("--ndjson", action="store_true", default=env("NDJSON", "0") == "1",
+                   help="also write <time>_results.ndjson (one line per case, written as cases finish)")
+    p.add_argument("--junit-xml", action="store_true", default=env("JUNIT_XML", "0") == "1",
+                   help="also write <time>_junit.xml (kept valid after every case)")
+    p.add_argument("--spill-output", action="store_true", default=setting.CAPTURE_SPILL,
+                   help="write captured output over CAPTURE_CASE_LIMIT to per-case files under the report dir")
+    p.add_argument("--history", action="store_true", default=env("HISTORY", "0") == "1",
+                   help="append this run's per-case results to the SQLite history (setting.HISTORY_DB)")
+
+    cas = p.add_argument_group("record / replay (take the network out of the loop)")
+    cas = cas.add_mutually_exclusive_group()
+    cas.add_argument("--record-cassette", default=env("RECORD_CASSETTE", ""), metavar="PATH",
+                     help="record every request/response of this run into a cassette file")
+    cas.add_argument("--replay-cassette", default=env("REPLAY_CASSETTE", ""), metavar="PATH",
+                     help="serve responses from a recorded cassette; no sockets, misses are reported")
+
+    shard = p.add_argument_group("sharding (fan out across CI agents; merge with lib/shardmerge.py)")
+    shard.add_argument("--shard", default=env("SHARD", ""), metavar="I/N",
+                       help="run only shard I of N (stable assignment by case ID)")
+    shard.add_argument("--shard-balance", action="store_true", default=env("SHARD_BALANCE", "0") == "1",
+                       help="balance shards by average case duration from the history database")
+    shard.add_argument("--shard-history", default=env("SHARD_HISTORY", setting.HISTORY_DB), metavar="PATH",
+                       help="history database used by --shard-balance (default setting.HISTORY_DB)")
+
+    perf = p.add_argument_group("latency regression gate (exit code 3 when latency regresses)")
+    perf.add_argument("--perf-gate", action="store_true", default=env("PERF_GATE", "0") == "1",
+                      help="check p50/p95 against Excel budget columns and the baseline file")
+    perf.add_argument("--perf-samples", type=int, default=setting.PERF_SAMPLES,
+                      help="extra sequential requests per passing case used for the percentiles")
+    perf.add_argument("--perf-baseline", default=env("PERF_BASELINE", ""),
+                      help="baseline file (default <report-dir>/perf_baseline.json)")
+    perf.add_argument("--perf-update-baseline", action="store_true",
+                      default=env("PERF_UPDATE_BASELINE", "0") == "1",
+                      help="write this run's percentiles as the new baseline (budgets are still checked)")
+
+    sel = p.add_argument_group("case selection (based on the previous run's recorded results)")
+    sel.add_argument("--rerun-failed", action="store_true", default=env("RERUN_FAILED", "0") == "1",
+                     help="run only cases that failed or errored last time")
+    sel.add_argument("--changed-only", action="store_true", default=env("CHANGED_ONLY", "0") == "1",
+                     help="run only cases whose request/expectation cells changed since they last ran")
+    sel.add_argument("--smoke-ids", default=env("SMOKE_IDS", ""),
+                     help="comma separated case IDs that always run with --rerun-failed/--changed-only")
+    sel.add_argument("--state-file", default=env("RUN_STATE_FILE", ""),
+                     help="per-case result history (default <report-dir>/last_run.json)")
+
+    load = p.add_argument_group("load mode (replay Excel cases at a target rate)")
+    load.add_argument("--load", action="store_true", help="run as a load generator instead of a test suite")
+    load.add_argument("--rps", type=float, default=float(env("LOAD_RPS", "50")), help="target requests per second")
+    load.add_argument("--duration", default=env("LOAD_DURATION", "30s"), help="e.g. 30s, 10m, 1h")
+    load.add_argument("--concurrency", type=int, default=int(env("LOAD_CONCURRENCY", "16")),
+                      help="max in-flight requests")
+    load.add_argument("--seed", type=int, default=None, help="seed for weighted case selection")
     return p.parse_args()
 
 
@@ -106,8 +329,14 @@ def main() -> int:
 
     args = parse_args()
 
-    # reset 放最前面（CI 下需要保证可重复跑）
-    reset_test_data(base_url, reset_path)
+    # reset 放最前面（CI 下需要保证可重复跑）；回放时不碰目标 API
+    if args.replay_cassette:
+        print(f"[INFO] replaying cassette -> {args.replay_cassette} (no network)")
+    else:
+        reset_test_data(base_url, reset_path, namespace=args.namespace)
+
+    if args.load:
+        return run_load_mode(args)
 
     try:
         suite = add_case(args.test_path, args.pattern)
@@ -115,31 +344,148 @@ def main() -> int:
         print(f"[ERROR] Failed to discover tests: {e}")
         return 2
 
+    state = RunState(args.state_file or os.path.join(args.report_dir, "last_run.json"))
+    if (args.rerun_failed or args.changed_only) and not state.loaded:
+        print(f"[WARN] no previous run state at {state.path}; running all cases")
+        args.rerun_failed = args.changed_only = False
+    # 链式 case（extract 列 / ${var}）：链内串行，选子集时带上上游 case
+    chains, deps = build_graph(iter_entries(suite), case_spec)
+    if chains:
+        print(f"[INFO] {len(chains)} chained cases in {len(set(chains.values()))} chains")
+    reset_variables()
+
+    # 分片：在完整 suite 上分配（与 --rerun-failed 等筛选无关），再在本 shard 内筛选
+    shard, plan, ordinals = None, None, None
+    if args.shard:
+        try:
+            shard = sharding.parse_shard(args.shard)
+            suite, plan, ordinals = apply_shard(args, suite, shard, chains)
+        except Exception as e:
+            print(f"[ERROR] Failed to shard cases: {e}")
+            return 2
+
+    suite, case_index, selected, total = select_cases(
+        suite, state, rerun_failed=args.rerun_failed, changed_only=args.changed_only,
+        smoke_ids=args.smoke_ids.split(","), deps=deps,
+    )
+    if selected != total:
+        print(f"[INFO] selected {selected} of {total} cases")
+
+    try:
+        if args.record_cassette:
+            open_cassette("record", args.record_cassette)
+        elif args.replay_cassette:
+            open_cassette("replay", args.replay_cassette)
+    except Exception as e:
+        print(f"[ERROR] Failed to open cassette: {e}")
+        return 2
+
+    # 分片时 Excel 结果同时留一份，随 shard payload 交给合并工具
+    excel_log = None
+    if shard:
+        excel_log = RecordingSink(get_result_sink())
+        set_result_sink(excel_log)
+
+    started_at = datetime.datetime.now()
     try:
         result, report_path, latest_path = run_case(
-            suite, args.report_dir, args.title, args.description, args.tester
+            suite, args.report_dir, args.title, args.description, args.tester,
+            workers=args.workers, processes=args.processes, test_path=args.test_path,
+            stream_report=args.stream_report, pattern=args.pattern, spill_output=args.spill_output,
+            ndjson=args.ndjson, junit_xml=args.junit_xml, chains=chains,
         )
     except Exception as e:
         print(f"[ERROR] Failed to run tests / generate report: {e}")
         return 2
 
+    try:
+        state.update(result, case_index)
+        state.save()
+    except Exception as e:
+        print(f"[WARN] Failed to save run state: {e}")
+
+    history_run_id = None
+    if args.history:
+        try:
+            history_run_id = record_run(
+                result, started_at, case_keys=case_index,
+                meta={"title": args.title, "base_url": base_url, "args": sys.argv[1:],
+                      "report_path": os.path.abspath(report_path)},
+            )
+        except Exception as e:
+            print(f"[WARN] Failed to record run history: {e}")
+
+    perf_regressions = run_perf_gate(args, result) if args.perf_gate else None
+
+    try:
+        cassette_stats = close_cassette()
+    except Exception as e:
+        cassette_stats = None
+        print(f"[WARN] Failed to write cassette: {e}")
+
     failures = len(getattr(result, "failures", []))
     errors = len(getattr(result, "errors", []))
     tests_run = getattr(result, "testsRun", 0)
 
     print("----- SUMMARY -----")
     print(f"TESTS_RUN={tests_run}")
+    print(f"CASES_SELECTED={selected}/{total}")
     print(f"FAILURES={failures}")
     print(f"ERRORS={errors}")
+    transport_stats = getattr(result, "transport_stats", None)
+    if transport_stats:
+        print(f"HTTP_REQUESTS={transport_stats['requests']}")
+        print(f"HTTP_NEW_CONNECTIONS={transport_stats['connections']}")
+        print(f"HTTP_REUSED_CONNECTIONS={transport_stats['reused']}")
+    retry_stats = resilience.stats()
+    if any(retry_stats.values()):
+        print(f"HTTP_RETRIES={retry_stats['retries']}")
+        print(f"CIRCUIT_OPENED={retry_stats['opened']}")
+        print(f"CIRCUIT_FAST_FAILED={retry_stats['fast_failed']}")
     print(f"REPORT_PATH={os.path.abspath(report_path)}")
     print(f"LATEST_REPORT_PATH={os.path.abspath(latest_path)}")
+    if getattr(result, "metrics_path", None):
+        print(f"METRICS_PATH={os.path.abspath(result.metrics_path)}")
+    sink_paths = getattr(result, "sink_paths", {})
+    if "NDJSONSink" in sink_paths:
+        print(f"NDJSON_PATH={os.path.abspath(sink_paths['NDJSONSink'])}")
+    if "JUnitXMLSink" in sink_paths:
+        print(f"JUNIT_XML_PATH={os.path.abspath(sink_paths['JUnitXMLSink'])}")
+    if cassette_stats:
+        print(f"CASSETTE_MODE={cassette_stats['mode']}")
+        print(f"CASSETTE_PATH={os.path.abspath(cassette_stats['path'])}")
+        print(f"CASSETTE_REQUESTS={cassette_stats['requests']}")
+        print(f"CASSETTE_MISSES={cassette_stats['misses']}")
+        for what, count in sorted(cassette_stats.get("missed", {}).items())[:20]:
+            print(f"[WARN] cassette miss x{count}: {what}")
+    if history_run_id is not None:
+        print(f"HISTORY_RUN_ID={history_run_id}")
 
     # ✅ 关键：把异常细节打印到 Jenkins console
     dump_result_details(result)
 
     ok = (failures == 0 and errors == 0)
-    print(f"RESULT={'SUCCESS' if ok else 'FAILED'}")
-    return 0 if ok else 1
+    if ok and perf_regressions:
+        status, rc = "PERF_REGRESSION", 3
+    else:
+        status, rc = ("SUCCESS", 0) if ok else ("FAILED", 1)
+
+    if shard:
+        summary = {"tests_run": tests_run, "failures": failures, "errors": errors,
+                   "skipped": len(getattr(result, "skipped", [])), "result": status, "exit_code": rc,
+                   "started_at": started_at.isoformat(timespec="seconds"), "report_path": os.path.abspath(report_path)}
+        try:
+            path = sharding.write_payload(
+                report_path.replace("_result.html", "_shard.json"), result, shard, plan, ordinals,
+                excel_log.rows, summary,
+            )
+            print(f"SHARD_PAYLOAD_PATH={os.path.abspath(path)}")
+        except Exception as e:
+            print(f"[ERROR] Failed to write shard payload: {e}")
+            status, rc = "FAILED", 2
+
+    print(f"RESULT={status}")
+    return rc
 
 
 if __name__ == "__main__":
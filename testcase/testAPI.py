@@ -4,33 +4,37 @@ __author__ = 'Qun Li'
 
 import os
 import sys
-import json
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 import unittest
-import requests
-import ddt
 
 from config import setting
-from lib.readexcel import ReadExcel
-from lib.sendrequests import SendRequests
-from lib.writeexcel import WriteExcel
+from lib.casecache import load_cases
+from lib.chaining import ExtractError, extract_into
+from lib.datadriven import data, expand_data_tests
+from lib.jsoncodec import response_json
+from lib.sendrequests import SendRequests, case_spec
+from lib.transport import get_transport
+from lib.writeexcel import get_result_sink
 
-testData = ReadExcel(setting.SOURCE_FILE, "Sheet1").read_data() or []
+# 预解析后的 case 列表（命中 sidecar 缓存时不再解析 Excel）
+testData = load_cases(setting.SOURCE_FILE, "Sheet1")
 
 
-@ddt.ddt
 class Demo_API(unittest.TestCase):
     """E-commerce API Automated Test Suite"""
 
     def setUp(self):
-        self.s = requests.session()
+        # suite 级共享连接池；每个 worker 线程一个 session
+        self.s = get_transport().session
+        # 请求耗时明细（SendRequests 填充），由 HTMLTestRunner / metrics 文件读取
+        self.metrics = None
 
     def tearDown(self):
         pass
 
-    @ddt.data(*testData)
+    @data(testData)
     def test_api(self, data):
         # 1) Defensive: skip empty rows / empty ID to avoid split(None)
         case_id = data.get("ID")
@@ -43,6 +47,11 @@ class Demo_API(unittest.TestCase):
         except Exception:
             self.fail(f"Invalid ID format: {case_id!r}. Expected like xxx_xxx_001")
 
+        # 可选列（extract / timeout）解析失败：只让这一行失败
+        spec_errors = case_spec(data).get("errors")
+        if spec_errors:
+            self.fail(f"Invalid Excel row {case_id!r}: {'; '.join(spec_errors)}")
+
         use_case = data.get("UseCase") or data.get("usecase") or ""
 
         print(f"******* Running test case -> {case_id} *********")
@@ -58,23 +67,21 @@ class Demo_API(unittest.TestCase):
         # 4) Defensive: if sendRequests returns None, an internal exception occurred
         if resp is None:
             self.fail("sendRequests returned None. Check printed traceback above.")
+        self.metrics = getattr(resp, "metrics", None)
 
-        # 5) Parse JSON response (if failed, print raw response for debugging)
+        # 5) Parse JSON response once (fast codec; if failed, print raw response for debugging)
         try:
-            result_json = resp.json()
+            body_text = resp.content.decode("utf-8")
         except Exception:
-            print("Response status_code:", getattr(resp, "status_code", None))
-            try:
-                print("Response text:", resp.text)
-            except Exception:
-                print("Response content(raw):", getattr(resp, "content", None))
-            self.fail("Response is not valid JSON; cannot parse resp.json().")
-
-        # Pretty print response body
+            body_text = repr(resp.content)
         try:
-            print("Response JSON:", resp.content.decode("utf-8"))
+            result_json = response_json(resp)
         except Exception:
-            print("Response content (cannot decode):", resp.content)
+            print("Response status_code:", getattr(resp, "status_code", None))
+            print("Response text:", body_text)
+            self.fail("Response is not valid JSON; cannot parse response body.")
+
+        print("Response JSON:", body_text)
 
         # 6) Read expected result from Excel
         #    status_code 可能是 "10021" / 10021 / "10021.0" 等，做一次强转更稳
@@ -119,28 +126,51 @@ class Demo_API(unittest.TestCase):
             if actual_message is None:
                 actual_message = "parameter error"
 
-        # 8) Write back to Excel (PASS/FAIL)
+        # 8) Write back to Excel (PASS/FAIL) -> buffered sink, flushed at suite end
         if readData_code == actual_status and readData_msg == actual_message:
-            ok_data = "PASS"
-            print(f"Test result: {case_id} ----> {ok_data}")
-            WriteExcel(setting.TARGET_FILE).write_data(rowNum + 1, ok_data)
+            result_data = "PASS"
         else:
-            not_data = "FAIL"
-            print(f"Test result: {case_id} ----> {not_data}")
-            WriteExcel(setting.TARGET_FILE).write_data(rowNum + 1, not_data)
+            result_data = "FAIL"
+        print(f"Test result: {case_id} ----> {result_data}")
+        metrics = self.metrics or {}
+        get_result_sink().write_data(
+            rowNum + 1,
+            result_data,
+            status=actual_status,
+            message=actual_message,
+            latency=metrics.get("total_ms"),
+            ttfb=metrics.get("ttfb_ms"),
+            connect=metrics.get("connect_ms"),
+            request_bytes=metrics.get("request_bytes"),
+            response_bytes=metrics.get("response_bytes"),
+            reused=metrics.get("reused"),
+        )
 
         # 9) Assertions (带上 HTTP 和 body，下一次失败就直接定位)
         self.assertEqual(
             actual_status,
             readData_code,
-            f"Actual status -> {actual_status} | HTTP={resp.status_code} | body={resp.text}"
+            f"Actual status -> {actual_status} | HTTP={resp.status_code} | body={body_text}"
         )
         self.assertEqual(
             actual_message,
             readData_msg,
-            f"Actual message -> {actual_message} | HTTP={resp.status_code} | body={resp.text}"
+            f"Actual message -> {actual_message} | HTTP={resp.status_code} | body={body_text}"
         )
 
+        # 10) 链式 case：通过后按 extract 列取值，供后面 ${var} 引用
+        try:
+            extracted = extract_into(case_spec(data), result_json)
+        except ExtractError as e:
+            self.fail(f"Extract failed -> {e} | body={body_text}")
+        if extracted:
+            print(f"Extracted: {extracted}")
+
+
+def load_tests(loader, tests, pattern):
+    # 每行 Excel 一条用例（test_api_01 ...），由 runner 迭代时才创建
+    return expand_data_tests(tests)
+
 
 if __name__ == '__main__':
     unittest.main()